@@ -0,0 +1,246 @@
+from __future__ import annotations
+
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+import glob
+from pathlib import Path
+import queue
+import time
+
+from . import opendota
+from .config import Config, load_config, load_profiles
+from .fingerprint import fingerprint_uploaded
+from .jobs import Job, JobStore, open_job_store
+from .notify import flush_notifications, start_notifier
+from .process_video import prepare_video, remux_video, resolve_match_ids, upload_video
+from .quota import UPLOAD_QUOTA_COST, QuotaExhausted, open_quota_ledger
+from .remux import check_tools
+from .stability import StabilityTracker
+
+
+@dataclass
+class _Planned:
+    path: Path
+    job: Job | None
+    match_id: int | None
+
+    @property
+    def action(self) -> str:
+        if self.job is not None and self.job.done:
+            return "skip"
+        if self.job is not None and self.job.reached("uploaded"):
+            return "notify"
+        if self.job is not None and self.job.reached("described"):
+            return "upload"
+        if self.match_id is None:
+            return "unresolved"
+        return "describe+upload"
+
+
+def _collect_files(source: str, exts: set[str]) -> list[Path]:
+    path = Path(source)
+    if path.is_dir():
+        candidates = [p for p in path.iterdir() if p.is_file()]
+    else:
+        candidates = [Path(p) for p in glob.glob(source, recursive=True)]
+
+    files: list[Path] = []
+    for p in sorted(p.resolve() for p in candidates if p.is_file() and p.suffix.lower() in exts):
+        # The stability wait never releases an empty file, and there is nothing in it to upload.
+        if p.stat().st_size == 0:
+            print(f"[backfill] skipping empty file: {p.name}")
+            continue
+        files.append(p)
+    return files
+
+
+def _wait_until_stable(config: Config, paths: list[Path]) -> set[Path]:
+    """Block until files that may still be written have settled; returns the ones deleted meanwhile."""
+    if not paths:
+        return set()
+
+    released: queue.Queue[tuple[Path, bool]] = queue.Queue()
+    tracker = StabilityTracker(
+        lambda p: released.put((p, True)),
+        quiet_seconds=config.stable_seconds,
+        poll_interval=config.stable_poll_sec,
+        on_gone=lambda p: released.put((p, False)),
+    )
+    for p in paths:
+        tracker.track(p)
+    tracker.start()
+    print(f"[backfill] waiting for {len(paths)} recent file(s) to finish writing")
+    gone: set[Path] = set()
+    try:
+        for _ in paths:
+            path, stable = released.get()
+            if not stable:
+                gone.add(path)
+    finally:
+        tracker.stop()
+    return gone
+
+
+def _plan(config: Config, jobs: JobStore, files: list[Path]) -> list[_Planned]:
+    known = {p: jobs.find(p) for p in files}
+    to_resolve = [p for p, job in known.items() if job is None or job.match_id is None]
+    match_ids = resolve_match_ids(config, to_resolve) if to_resolve else {}
+
+    plan: list[_Planned] = []
+    for p in files:
+        job = known[p]
+        match_id = job.match_id if job is not None and job.match_id is not None else match_ids.get(p)
+        plan.append(_Planned(path=p, job=job, match_id=match_id))
+    return plan
+
+
+def _print_report(plan: list[_Planned], upload_budget: int) -> None:
+    counts: dict[str, int] = {}
+    for item in plan:
+        counts[item.action] = counts.get(item.action, 0) + 1
+
+    uploads = sum(1 for item in plan if item.action in {"upload", "describe+upload"})
+    scheduled = min(uploads, upload_budget)
+
+    for item in plan:
+        match = item.match_id if item.match_id is not None else "-"
+        print(f"[backfill:plan] {item.path.name} match={match} action={item.action}")
+
+    summary = " ".join(f"{action}={n}" for action, n in sorted(counts.items()))
+    print(f"[backfill] files={len(plan)} {summary}")
+    print(
+        f"[backfill] uploads this run: {scheduled} "
+        f"(budget {upload_budget} x {UPLOAD_QUOTA_COST} units); deferred: {uploads - scheduled}"
+    )
+    if upload_budget > 0 and uploads > scheduled:
+        days = -(-uploads // upload_budget)
+        print(f"[backfill] at this budget the archive needs about {days} day(s) of uploads")
+
+
+def run_backfill(
+    config: Config,
+    source: str,
+    *,
+    min_age_sec: float,
+    workers: int,
+    quota_units: int,
+    dry_run: bool,
+) -> None:
+    files = _collect_files(source, config.video_extensions)
+    if not files:
+        print(f"[backfill] no video files match {source}")
+        return
+
+    jobs = open_job_store(config.data_dir)
+    fingerprint_uploaded(jobs)
+    plan = _plan(config, jobs, files)
+    remaining = open_quota_ledger(config.data_dir).remaining(config.youtube_client_id, config.youtube_daily_quota)
+    print(f"[backfill] YouTube quota left today: {remaining} of {config.youtube_daily_quota} units")
+    upload_budget = min(quota_units, remaining) // UPLOAD_QUOTA_COST
+    _print_report(plan, upload_budget)
+    if dry_run:
+        return
+
+    if config.remux_enabled or config.thumbnails_enabled:
+        check_tools(config)
+    start_notifier(config)
+    now = time.time()
+    todo = [item for item in plan if item.action != "skip"]
+    recent = [item.path for item in todo if now - item.path.stat().st_mtime < min_age_sec]
+    gone = _wait_until_stable(config, recent)
+    todo = [item for item in todo if item.path not in gone]
+
+    # Describe everything in parallel; OpenDota calls are rate limited by the shared client.
+    def _describe(item: _Planned) -> Job | None:
+        job = jobs.job_for(item.path, profile=config.profile)
+        if job.reached("described"):
+            return job
+        return prepare_video(config, jobs, job, match_id=item.match_id)
+
+    with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="backfill-describe") as pool:
+        described = [job for job in pool.map(_describe, todo) if job is not None]
+
+    # Jobs that only need their notification, or resume an upload session
+    # that was already paid for, cost no quota and go first.
+    free = [job for job in described if job.reached("uploaded") or job.upload_uri]
+    needs_upload = sorted(
+        (job for job in described if job not in free),
+        key=lambda j: j.path.name,
+        reverse=config.upload_order == "newest",
+    )
+    scheduled = free + needs_upload[:upload_budget]
+    over_budget = len(needs_upload) - len(needs_upload[:upload_budget])
+
+    # Remux right before each upload, so at most one copy per upload worker
+    # (plus deferred ones) sits in the temp space.
+    def _upload(job: Job) -> str:
+        if config.remux_enabled:
+            remuxed = remux_video(config, jobs, job)
+            if remuxed is None:
+                return "rejected"
+            job = remuxed
+        try:
+            upload_video(config, jobs, job)
+        except QuotaExhausted as err:
+            print(f"[backfill] deferred {job.path.name}: {err}")
+            return "deferred"
+        return "attempted"
+
+    with ThreadPoolExecutor(max_workers=max(1, config.upload_workers), thread_name_prefix="backfill-upload") as pool:
+        outcomes = list(pool.map(_upload, scheduled))
+
+    print(
+        f"[backfill] done: described={len(described)} attempted={outcomes.count('attempted')} "
+        f"rejected={outcomes.count('rejected')} deferred={over_budget + outcomes.count('deferred')}"
+    )
+
+    left = flush_notifications(config, timeout=60.0)
+    if left:
+        print(f"[backfill] {left} webhook event(s) still queued; the watcher sends them when it next runs")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        prog="python3 -m obs_youtube_uploader.backfill",
+        description="Process an archive of existing OBS recordings.",
+    )
+    parser.add_argument("source", help="directory or glob pattern (quote it), e.g. '/app/watch/2025-*.mp4'")
+    parser.add_argument("--dry-run", action="store_true", help="only print the planned work")
+    parser.add_argument(
+        "--min-age-sec",
+        type=float,
+        default=600,
+        help="files modified longer ago than this skip the stability wait (default 600)",
+    )
+    parser.add_argument("--workers", type=int, default=8, help="parallel description workers (default 8)")
+    parser.add_argument(
+        "--quota-units",
+        type=int,
+        default=None,
+        help="YouTube quota units this run may spend on uploads (default YOUTUBE_DAILY_QUOTA)",
+    )
+    parser.add_argument("--profile", help="profile from PROFILES_FILE the recordings belong to")
+    args = parser.parse_args()
+
+    base = load_config()
+    profiles = {p.profile: p for p in load_profiles(base)}
+    if args.profile is None and len(profiles) > 1:
+        parser.error(f"--profile is required with several profiles ({', '.join(profiles)})")
+    if args.profile is not None and args.profile not in profiles:
+        parser.error(f"unknown profile {args.profile!r} (expected one of: {', '.join(profiles)})")
+    config = profiles[args.profile] if args.profile else next(iter(profiles.values()))
+
+    opendota.configure(base)
+    run_backfill(
+        config,
+        args.source,
+        min_age_sec=args.min_age_sec,
+        workers=args.workers,
+        quota_units=args.quota_units if args.quota_units is not None else config.youtube_daily_quota,
+        dry_run=args.dry_run,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,25 +1,46 @@
 from __future__ import annotations
 
-from dataclasses import dataclass
+from dataclasses import dataclass, fields, replace
+import json
 import os
 from pathlib import Path
 
 from dotenv import load_dotenv
 
+from .templates import (
+    DEFAULT_DESCRIPTION_TEMPLATE,
+    DEFAULT_TAGS_TEMPLATE,
+    DEFAULT_TITLE_TEMPLATE,
+    load_templates,
+)
+
 
 @dataclass(frozen=True)
 class Config:
+    # Name of the player/channel profile this config belongs to.
+    profile: str
+    profiles_file: Path | None
     watch_folder: Path
     video_extensions: set[str]
     process_existing: bool
+    watch_mode: str
+    watch_poll_sec: float
     dry_run: bool
+    data_dir: Path
 
     recording_tz: str
     match_time_before_sec: int
     match_time_after_sec: int
 
     opendota_player_id: int
+    opendota_rate_per_min: float
+    opendota_max_concurrency: int
+    constants_cache_dir: Path
+    constants_ttl_sec: dict[str, int]
     n8n_webhook_url: str
+    webhook_batch_size: int
+    webhook_max_attempts: int
+    webhook_stage_events: bool
 
     youtube_client_id: str
     youtube_client_secret: str
@@ -27,6 +48,37 @@ class Config:
     youtube_privacy_status: str
     youtube_category_id: str | None
     youtube_tags: list[str]
+    youtube_upload_max_retries: int
+    youtube_upload_chunk_mb: float
+    youtube_daily_quota: int
+
+    stable_seconds: float
+    stable_poll_sec: float
+    describe_workers: int
+    upload_workers: int
+    upload_max_mbps: float
+    upload_order: str
+    dedupe_uploads: bool
+    remux_enabled: bool
+    remux_dir: Path
+    remux_workers: int
+    remux_max_temp_gb: float
+    ffmpeg_path: str
+    ffprobe_path: str
+    chapters_enabled: bool
+    chapter_min_gap_sec: int
+    thumbnails_enabled: bool
+    thumbnail_workers: int
+    thumbnail_font: str | None
+    title_template: str
+    description_template: str
+    tags_template: str
+    highlights_enabled: bool
+    highlights_dir: Path
+    highlight_min_kills: int
+    highlight_offset_sec: float
+    highlight_workers: int
+    stage_queue_size: int
 
 
 def _parse_bool(value: str | None, default: bool) -> bool:
@@ -48,12 +100,40 @@ def _parse_extensions(value: str | None) -> set[str]:
     return out
 
 
+def _read_template(env_name: str, default: str) -> str:
+    path = os.getenv(env_name)
+    if not path:
+        return default
+    try:
+        return Path(path).read_text(encoding="utf-8")
+    except OSError as err:
+        raise RuntimeError(f"Could not read {env_name} {path}: {err}") from err
+
+
+def _check_youtube_credentials(config: Config) -> None:
+    if config.dry_run:
+        return
+    label = "" if config.profile == "default" else f" for profile '{config.profile}'"
+    if not config.youtube_client_id:
+        raise RuntimeError(f"Missing YOUTUBE_CLIENT_ID{label} (or set DRY_RUN=true)")
+    if not config.youtube_client_secret:
+        raise RuntimeError(f"Missing YOUTUBE_CLIENT_SECRET{label} (or set DRY_RUN=true)")
+    if not config.youtube_refresh_token:
+        raise RuntimeError(f"Missing YOUTUBE_REFRESH_TOKEN{label} (or set DRY_RUN=true)")
+
+
 def load_config() -> Config:
     load_dotenv()
 
     dry_run = _parse_bool(os.getenv("DRY_RUN"), False)
 
     watch_folder = Path(os.getenv("WATCH_FOLDER") or (Path.cwd() / "watch")).resolve()
+    data_dir = Path(os.getenv("DATA_DIR") or (Path.cwd() / "data")).resolve()
+
+    watch_mode = (os.getenv("WATCH_MODE") or "auto").strip().lower()
+    if watch_mode not in {"auto", "native", "polling"}:
+        raise RuntimeError(f"Invalid WATCH_MODE: {watch_mode} (expected auto, native or polling)")
+    watch_poll_sec = float(os.getenv("WATCH_POLL_SEC") or "2")
 
     recording_tz = os.getenv("RECORDING_TZ") or "America/New_York"
 
@@ -61,10 +141,23 @@ def load_config() -> Config:
     match_time_after_sec = int(os.getenv("MATCH_TIME_AFTER_SEC") or str(3 * 60 * 60))
 
     opendota_player_id = int(os.getenv("OPENDOTA_PLAYER_ID") or "115732760")
+    # OpenDota free tier allows 60 calls/minute.
+    opendota_rate_per_min = float(os.getenv("OPENDOTA_RATE_PER_MIN") or "60")
+    opendota_max_concurrency = int(os.getenv("OPENDOTA_MAX_CONCURRENCY") or "10")
+
+    constants_cache_dir = Path(os.getenv("CONSTANTS_CACHE_DIR") or (data_dir / "constants")).resolve()
+    constants_ttl_sec = {
+        "heroes": int(os.getenv("CONSTANTS_HEROES_TTL_SEC") or str(24 * 60 * 60)),
+        "items": int(os.getenv("CONSTANTS_ITEMS_TTL_SEC") or str(24 * 60 * 60)),
+        "patch": int(os.getenv("CONSTANTS_PATCH_TTL_SEC") or str(6 * 60 * 60)),
+    }
 
     n8n_webhook_url = os.getenv("N8N_WEBHOOK_URL")
     if not n8n_webhook_url:
         raise RuntimeError("Missing N8N_WEBHOOK_URL")
+    webhook_batch_size = int(os.getenv("WEBHOOK_BATCH_SIZE") or "1")
+    webhook_max_attempts = int(os.getenv("WEBHOOK_MAX_ATTEMPTS") or "50")
+    webhook_stage_events = _parse_bool(os.getenv("WEBHOOK_STAGE_EVENTS"), False)
 
     youtube_client_id = os.getenv("YOUTUBE_CLIENT_ID") or ""
     youtube_client_secret = os.getenv("YOUTUBE_CLIENT_SECRET") or ""
@@ -73,29 +166,174 @@ def load_config() -> Config:
     youtube_privacy_status = os.getenv("YOUTUBE_PRIVACY_STATUS") or "unlisted"
     youtube_category_id = os.getenv("YOUTUBE_CATEGORY_ID") or None
     youtube_tags = [t.strip() for t in (os.getenv("YOUTUBE_TAGS") or "").split(",") if t.strip()]
+    youtube_upload_max_retries = int(os.getenv("YOUTUBE_UPLOAD_MAX_RETRIES") or "10")
+    youtube_upload_chunk_mb = float(os.getenv("YOUTUBE_UPLOAD_CHUNK_MB") or "100")
+    youtube_daily_quota = int(os.getenv("YOUTUBE_DAILY_QUOTA") or "10000")
+
+    stable_seconds = float(os.getenv("STABLE_SECONDS") or "20")
+    stable_poll_sec = float(os.getenv("STABLE_POLL_SEC") or "2")
+    describe_workers = int(os.getenv("DESCRIBE_WORKERS") or "2")
+    upload_workers = int(os.getenv("UPLOAD_WORKERS") or "1")
+    upload_max_mbps = float(os.getenv("UPLOAD_MAX_MBPS") or "0")
+    upload_order = (os.getenv("UPLOAD_ORDER") or "fifo").strip().lower()
+    if upload_order not in {"fifo", "newest"}:
+        raise RuntimeError(f"Invalid UPLOAD_ORDER: {upload_order} (expected fifo or newest)")
+
+    remux_enabled = _parse_bool(os.getenv("REMUX"), False)
+    remux_dir = Path(os.getenv("REMUX_DIR") or (data_dir / "remux")).resolve()
+    # Stream copies are mostly I/O; one per core keeps a large backlog from saturating the disk.
+    remux_workers = int(os.getenv("REMUX_WORKERS") or str(os.cpu_count() or 1))
+    remux_max_temp_gb = float(os.getenv("REMUX_MAX_TEMP_GB") or "20")
+    ffmpeg_path = os.getenv("FFMPEG_PATH") or "ffmpeg"
+    ffprobe_path = os.getenv("FFPROBE_PATH") or "ffprobe"
+    highlights_enabled = _parse_bool(os.getenv("HIGHLIGHTS"), False)
+    highlights_dir = Path(os.getenv("HIGHLIGHTS_DIR") or (data_dir / "highlights")).resolve()
+    highlight_min_kills = int(os.getenv("HIGHLIGHT_MIN_KILLS") or "3")
+    highlight_offset_sec = float(os.getenv("HIGHLIGHT_OFFSET_SEC") or "0")
+    highlight_workers = int(os.getenv("HIGHLIGHT_WORKERS") or str(os.cpu_count() or 1))
+    stage_queue_size = int(os.getenv("STAGE_QUEUE_SIZE") or "100")
+
+    title_template = os.getenv("TITLE_TEMPLATE") or DEFAULT_TITLE_TEMPLATE
+    description_template = _read_template("DESCRIPTION_TEMPLATE_FILE", DEFAULT_DESCRIPTION_TEMPLATE)
+    tags_template = _read_template("TAGS_TEMPLATE_FILE", DEFAULT_TAGS_TEMPLATE)
+    # Compile now so a broken template fails at startup, not at the first upload.
+    load_templates(title_template, description_template, tags_template)
 
-    if not dry_run:
-        if not youtube_client_id:
-            raise RuntimeError("Missing YOUTUBE_CLIENT_ID (or set DRY_RUN=true)")
-        if not youtube_client_secret:
-            raise RuntimeError("Missing YOUTUBE_CLIENT_SECRET (or set DRY_RUN=true)")
-        if not youtube_refresh_token:
-            raise RuntimeError("Missing YOUTUBE_REFRESH_TOKEN (or set DRY_RUN=true)")
+    profiles_file_env = os.getenv("PROFILES_FILE")
+    profiles_file = Path(profiles_file_env).resolve() if profiles_file_env else None
 
-    return Config(
+    config = Config(
+        profile="default",
+        profiles_file=profiles_file,
         watch_folder=watch_folder,
         video_extensions=_parse_extensions(os.getenv("VIDEO_EXTENSIONS")),
         process_existing=_parse_bool(os.getenv("PROCESS_EXISTING"), False),
+        watch_mode=watch_mode,
+        watch_poll_sec=watch_poll_sec,
         dry_run=dry_run,
+        data_dir=data_dir,
         recording_tz=recording_tz,
         match_time_before_sec=match_time_before_sec,
         match_time_after_sec=match_time_after_sec,
         opendota_player_id=opendota_player_id,
+        opendota_rate_per_min=opendota_rate_per_min,
+        opendota_max_concurrency=opendota_max_concurrency,
+        constants_cache_dir=constants_cache_dir,
+        constants_ttl_sec=constants_ttl_sec,
         n8n_webhook_url=n8n_webhook_url,
+        webhook_batch_size=webhook_batch_size,
+        webhook_max_attempts=webhook_max_attempts,
+        webhook_stage_events=webhook_stage_events,
         youtube_client_id=youtube_client_id,
         youtube_client_secret=youtube_client_secret,
         youtube_refresh_token=youtube_refresh_token,
         youtube_privacy_status=youtube_privacy_status,
         youtube_category_id=youtube_category_id,
         youtube_tags=youtube_tags,
+        youtube_upload_max_retries=youtube_upload_max_retries,
+        youtube_upload_chunk_mb=youtube_upload_chunk_mb,
+        youtube_daily_quota=youtube_daily_quota,
+        stable_seconds=stable_seconds,
+        stable_poll_sec=stable_poll_sec,
+        describe_workers=describe_workers,
+        upload_workers=upload_workers,
+        upload_max_mbps=upload_max_mbps,
+        upload_order=upload_order,
+        dedupe_uploads=_parse_bool(os.getenv("DEDUPE_UPLOADS"), True),
+        remux_enabled=remux_enabled,
+        remux_dir=remux_dir,
+        remux_workers=remux_workers,
+        remux_max_temp_gb=remux_max_temp_gb,
+        ffmpeg_path=ffmpeg_path,
+        ffprobe_path=ffprobe_path,
+        chapters_enabled=_parse_bool(os.getenv("CHAPTERS"), True),
+        chapter_min_gap_sec=int(os.getenv("CHAPTER_MIN_GAP_SEC") or "60"),
+        thumbnails_enabled=_parse_bool(os.getenv("THUMBNAILS"), False),
+        thumbnail_workers=int(os.getenv("THUMBNAIL_WORKERS") or "2"),
+        thumbnail_font=os.getenv("THUMBNAIL_FONT") or None,
+        title_template=title_template,
+        description_template=description_template,
+        tags_template=tags_template,
+        highlights_enabled=highlights_enabled,
+        highlights_dir=highlights_dir,
+        highlight_min_kills=highlight_min_kills,
+        highlight_offset_sec=highlight_offset_sec,
+        highlight_workers=highlight_workers,
+        stage_queue_size=stage_queue_size,
     )
+    # With a profiles file, the credentials are checked per profile instead.
+    if profiles_file is None:
+        _check_youtube_credentials(config)
+    return config
+
+
+# Settings a profile may override; everything else (workers, data dir,
+# OpenDota limits, constants cache) is shared by the whole process.
+_PROFILE_FIELDS = {
+    "watch_folder",
+    "recording_tz",
+    "match_time_before_sec",
+    "match_time_after_sec",
+    "opendota_player_id",
+    "n8n_webhook_url",
+    "youtube_client_id",
+    "youtube_client_secret",
+    "youtube_refresh_token",
+    "youtube_privacy_status",
+    "youtube_category_id",
+    "youtube_tags",
+}
+
+
+def _profile_value(name: str, value: object) -> object:
+    if name == "watch_folder":
+        return Path(str(value)).resolve()
+    if name in {"opendota_player_id", "match_time_before_sec", "match_time_after_sec"}:
+        return int(value)  # type: ignore[arg-type]
+    if name == "youtube_tags":
+        items = value.split(",") if isinstance(value, str) else list(value)  # type: ignore[arg-type]
+        return [str(t).strip() for t in items if str(t).strip()]
+    if name == "youtube_category_id":
+        return str(value) if value else None
+    return str(value)
+
+
+def load_profiles(config: Config) -> list[Config]:
+    """One config per profile in ``PROFILES_FILE`` (just ``config`` without one).
+
+    The file is a JSON list of objects with a unique ``name`` plus any of
+    ``_PROFILE_FIELDS``; omitted fields fall back to the environment.
+    """
+    if config.profiles_file is None:
+        return [config]
+
+    try:
+        raw = json.loads(config.profiles_file.read_text(encoding="utf-8"))
+    except (OSError, ValueError) as err:
+        raise RuntimeError(f"Could not read PROFILES_FILE {config.profiles_file}: {err}") from err
+    if not isinstance(raw, list) or not raw:
+        raise RuntimeError(f"PROFILES_FILE {config.profiles_file} must contain a non-empty JSON list")
+
+    known = {f.name for f in fields(Config)}
+    profiles: list[Config] = []
+    for entry in raw:
+        name = str(entry.get("name") or "").strip() if isinstance(entry, dict) else ""
+        if not name:
+            raise RuntimeError("Every profile in PROFILES_FILE needs a name")
+        unknown = set(entry) - _PROFILE_FIELDS - {"name"}
+        if unknown:
+            hint = " (shared setting, set it in the environment)" if unknown & known else ""
+            raise RuntimeError(f"Profile '{name}': unsupported keys {sorted(unknown)}{hint}")
+
+        overrides = {key: _profile_value(key, value) for key, value in entry.items() if key != "name"}
+        profile = replace(config, profile=name, **overrides)
+        _check_youtube_credentials(profile)
+        profiles.append(profile)
+
+    names = [p.profile for p in profiles]
+    if len(set(names)) != len(names):
+        raise RuntimeError("Profile names in PROFILES_FILE must be unique")
+    folders = [p.watch_folder for p in profiles]
+    if len(set(folders)) != len(folders):
+        raise RuntimeError("Each profile in PROFILES_FILE needs its own watch_folder")
+    return profiles
@@ -0,0 +1,81 @@
+from __future__ import annotations
+
+from bisect import bisect_right
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Any
+
+
+def index_heroes(heroes: dict[str, Any]) -> dict[int, str]:
+    out: dict[int, str] = {}
+    for h in heroes.values():
+        try:
+            hero_id = int(h.get("id", -1))
+        except Exception:
+            continue
+        out.setdefault(hero_id, str(h.get("localized_name") or f"Hero {hero_id}"))
+    return out
+
+
+def index_items(items: dict[str, Any]) -> dict[int, str]:
+    out: dict[int, str] = {}
+    for i in items.values():
+        try:
+            item_id = int(i.get("id", -1))
+        except Exception:
+            continue
+        out.setdefault(item_id, str(i.get("dname") or f"Item {item_id}"))
+    return out
+
+
+def _parse_patch_date(value: Any) -> int | None:
+    if not value:
+        return None
+    try:
+        dt = datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return int(dt.timestamp())
+
+
+def index_patches(patches: list[dict[str, Any]]) -> tuple[dict[int, str], list[tuple[int, str]]]:
+    """Return (patch id -> name, [(release epoch, name)] sorted by release)."""
+    names: dict[int, str] = {}
+    starts: list[tuple[int, str]] = []
+    for p in patches:
+        name = str(p.get("name"))
+        try:
+            names.setdefault(int(p.get("id", -1)), name)
+        except Exception:
+            pass
+        released = _parse_patch_date(p.get("date"))
+        if released is not None:
+            starts.append((released, name))
+    starts.sort(key=lambda t: t[0])
+    return names, starts
+
+
+@dataclass(frozen=True)
+class ConstantsIndex:
+    """O(1) id -> name lookups over the OpenDota heroes/items/patch constants."""
+
+    hero_names: dict[int, str]
+    item_names: dict[int, str]
+    patch_names: dict[int, str]
+    patch_starts: list[tuple[int, str]]
+
+    def hero_name(self, hero_id: int) -> str:
+        return self.hero_names.get(hero_id) or f"Hero {hero_id}"
+
+    def item_name(self, item_id: int) -> str:
+        return self.item_names.get(item_id) or f"Item {item_id}"
+
+    def patch_name(self, patch_id: int) -> str | None:
+        return self.patch_names.get(patch_id)
+
+    def patch_name_at(self, epoch: int) -> str | None:
+        """Name of the patch that was live at ``epoch`` (by release date)."""
+        i = bisect_right(self.patch_starts, epoch, key=lambda t: t[0])
+        return self.patch_starts[i - 1][1] if i > 0 else None
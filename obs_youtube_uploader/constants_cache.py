@@ -0,0 +1,120 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+import json
+import os
+from pathlib import Path
+import tempfile
+import time
+from typing import Any
+
+
+@dataclass
+class CacheEntry:
+    data: Any
+    fetched_at: float
+    etag: str | None = None
+    last_modified: str | None = None
+    # In-memory only: don't hit the network again before this (wall clock).
+    retry_at: float = 0.0
+
+
+class ConstantsCache:
+    """Disk-backed cache for OpenDota constants payloads.
+
+    Each resource is stored as ``<cache_dir>/<resource>.json`` together with
+    the time it was fetched and the ETag/Last-Modified validators, so a
+    restarted process can serve constants without any network round trip
+    and later revalidate them with a conditional GET.
+    """
+
+    def __init__(self, cache_dir: Path | None, ttl_sec: dict[str, int], *, default_ttl_sec: int = 24 * 60 * 60):
+        self._dir = cache_dir
+        self._ttl_sec = dict(ttl_sec)
+        self._default_ttl_sec = default_ttl_sec
+        self._mem: dict[str, CacheEntry] = {}
+
+    def ttl_for(self, resource: str) -> int:
+        return self._ttl_sec.get(resource, self._default_ttl_sec)
+
+    def load(self, resource: str) -> CacheEntry | None:
+        entry = self._mem.get(resource)
+        if entry is not None:
+            return entry
+
+        path = self._path(resource)
+        if path is None or not path.exists():
+            return None
+        try:
+            raw = json.loads(path.read_text(encoding="utf-8"))
+            entry = CacheEntry(
+                data=raw["data"],
+                fetched_at=float(raw.get("fetchedAt") or 0),
+                etag=raw.get("etag"),
+                last_modified=raw.get("lastModified"),
+            )
+        except Exception as err:
+            print(f"[constants:cache] ignoring unreadable {path}: {err}")
+            return None
+
+        self._mem[resource] = entry
+        return entry
+
+    def is_fresh(self, resource: str, entry: CacheEntry) -> bool:
+        now = time.time()
+        return now < entry.retry_at or (now - entry.fetched_at) < self.ttl_for(resource)
+
+    def conditional_headers(self, entry: CacheEntry | None) -> dict[str, str]:
+        headers: dict[str, str] = {}
+        if entry is None:
+            return headers
+        if entry.etag:
+            headers["If-None-Match"] = entry.etag
+        if entry.last_modified:
+            headers["If-Modified-Since"] = entry.last_modified
+        return headers
+
+    def store(self, resource: str, data: Any, *, etag: str | None, last_modified: str | None) -> CacheEntry:
+        entry = CacheEntry(data=data, fetched_at=time.time(), etag=etag, last_modified=last_modified)
+        self._mem[resource] = entry
+        self._write(resource, entry)
+        return entry
+
+    def touch(self, resource: str, entry: CacheEntry) -> CacheEntry:
+        """Mark ``entry`` as revalidated (HTTP 304) without changing its data."""
+        entry.fetched_at = time.time()
+        entry.retry_at = 0.0
+        self._mem[resource] = entry
+        self._write(resource, entry)
+        return entry
+
+    def defer(self, entry: CacheEntry, seconds: float) -> None:
+        """Keep serving a stale ``entry`` for ``seconds`` after a failed refresh."""
+        entry.retry_at = time.time() + seconds
+
+    def _path(self, resource: str) -> Path | None:
+        return self._dir / f"{resource}.json" if self._dir is not None else None
+
+    def _write(self, resource: str, entry: CacheEntry) -> None:
+        path = self._path(resource)
+        if path is None:
+            return
+
+        payload = {
+            "fetchedAt": entry.fetched_at,
+            "etag": entry.etag,
+            "lastModified": entry.last_modified,
+            "data": entry.data,
+        }
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            fd, tmp = tempfile.mkstemp(prefix=f".{resource}.", suffix=".tmp", dir=str(path.parent))
+            try:
+                with os.fdopen(fd, "w", encoding="utf-8") as f:
+                    json.dump(payload, f)
+                os.replace(tmp, path)
+            except BaseException:
+                os.unlink(tmp)
+                raise
+        except OSError as err:
+            print(f"[constants:cache] could not write {path}: {err}")
@@ -1,7 +1,11 @@
 from __future__ import annotations
 
+from dataclasses import dataclass, replace
 from datetime import datetime
-from typing import Any
+
+from .constants import ConstantsIndex
+from .match_model import ItemSlots, Match
+from .timeline import Chapter, format_chapters
 
 
 def _format_duration(total_seconds: int) -> str:
@@ -10,94 +14,123 @@ def _format_duration(total_seconds: int) -> str:
     return f"{m}:{s:02d}"
 
 
-def _hero_name(heroes: dict[str, Any], hero_id: int) -> str:
-    for h in heroes.values():
-        if int(h.get("id", -1)) == hero_id:
-            return str(h.get("localized_name") or f"Hero {hero_id}")
-    return f"Hero {hero_id}"
-
-
-def _item_name(items: dict[str, Any], item_id: int) -> str:
-    for i in items.values():
-        if int(i.get("id", -1)) == item_id:
-            return str(i.get("dname") or f"Item {item_id}")
-    return f"Item {item_id}"
-
-
-def _format_item_list(items: dict[str, Any], ids: list[int | None]) -> str:
-    names: list[str] = []
-    for item_id in ids:
-        if not item_id or int(item_id) <= 0:
-            continue
-        names.append(_item_name(items, int(item_id)))
+def _format_item_list(constants: ConstantsIndex, ids: tuple[int, ...]) -> str:
+    names = [constants.item_name(item_id) for item_id in ids if item_id > 0]
     return ", ".join(names) if names else "—"
 
 
-def build_match_description(
-    *,
-    recording_start_utc: datetime,
-    player_account_id: int,
-    match: dict[str, Any],
-    heroes: dict[str, Any],
-    items: dict[str, Any],
-) -> str:
-    match_id = int(match.get("match_id") or 0)
-    match_start = datetime.utcfromtimestamp(int(match.get("start_time") or 0))
-
-    winner = "Radiant" if bool(match.get("radiant_win")) else "Dire"
+def _item_names(items: ItemSlots, constants: ConstantsIndex) -> tuple[str, ...]:
+    """Names of the final six items and the neutral item, without repeats."""
+    names = [constants.item_name(item_id) for item_id in (*items.main, items.neutral) if item_id > 0]
+    return tuple(dict.fromkeys(names))
+
+
+@dataclass(frozen=True, slots=True)
+class MatchContext:
+    """Everything the title, description and tag templates can use, computed once per recording.
+
+    Player fields are None when the player isn't in the match.
+    """
+
+    match_id: int
+    match_url: str
+    recording_start: str
+    match_start: str
+    duration: str
+    duration_min: int
+    winner: str
+    radiant_score: int
+    dire_score: int
+    score: str
+    hero: str
+    patch: str | None
+    result: str
+    account_id: int | None
+    kills: int | None
+    deaths: int | None
+    assists: int | None
+    kda: str | None
+    main_items: str | None
+    backpack_items: str | None
+    neutral_item: str | None
+    items: str | None
+    item_names: tuple[str, ...]
+    chapters: str | None
+    thumbnail_prompt: str | None
+
+
+def _thumbnail_prompt(ctx: MatchContext) -> str:
+    patch_part = f"Patch {ctx.patch}" if ctx.patch else "Current Patch"
 
     lines: list[str] = []
-    lines.append(f"Match ID: {match_id}")
-    lines.append(f"Recording start (UTC): {recording_start_utc.isoformat()}Z")
-    lines.append(f"Match start (UTC): {match_start.isoformat()}Z")
-    lines.append(f"Duration: {_format_duration(int(match.get('duration', 0)))}")
-    lines.append(f"Winner: {winner}")
+    lines.append("Create a YouTube thumbnail for a Dota 2 match video.")
+    lines.append(f"Hero: {ctx.hero}.")
+    lines.append(f"Match result: {ctx.result}.")
+    lines.append(f"Match length: {ctx.duration_min} minutes.")
+    lines.append(f"Score: {ctx.score}.")
+    if ctx.kda:
+        lines.append(f"KDA: {ctx.kda}.")
+    if ctx.item_names:
+        lines.append(f"Key items: {', '.join(ctx.item_names[:8])}.")
+    lines.append(f"{patch_part}.")
+    lines.append(f"Match ID: {ctx.match_id}.")
+    lines.append(
+        "Style: high-contrast esports thumbnail, sharp hero portrait, dynamic action background, "
+        "bold readable text, clean composition, 16:9, 1280x720."
+    )
     lines.append(
-        f"Score: Radiant {int(match.get('radiant_score', 0))} - {int(match.get('dire_score', 0))} Dire"
+        f"Text overlay (few words): '{ctx.hero.upper()} BUILD' and '{ctx.result.upper()}' and '{patch_part.upper()}'."
     )
+    lines.append("Avoid: small text, clutter, watermarks, blurry faces.")
+
+    return " ".join(lines)
 
-    player = None
-    for p in match.get("players", []) or []:
-        if p.get("account_id") == player_account_id:
-            player = p
-            break
 
+def build_match_context(
+    *,
+    recording_start_utc: datetime,
+    player_account_id: int,
+    match: Match,
+    constants: ConstantsIndex,
+    patch: str | None,
+    chapters: list[Chapter] | None = None,
+) -> MatchContext:
+    """Derive the template values from the match once; templates then only look them up."""
+    player = match.player(player_account_id)
+    player_is_radiant = player is not None and player.is_radiant
+    main_items = backpack_items = neutral_item = None
+    item_names: tuple[str, ...] = ()
     if player:
-        lines.append("")
-        lines.append("Player")
-        lines.append(f"Account ID: {player_account_id}")
-        lines.append(f"Hero: {_hero_name(heroes, int(player.get('hero_id', 0)))}")
-        lines.append(
-            f"K/D/A: {int(player.get('kills', 0))}/{int(player.get('deaths', 0))}/{int(player.get('assists', 0))}"
-        )
-
-        lines.append("")
-        lines.append("Items")
-        lines.append(
-            "Main: "
-            + _format_item_list(
-                items,
-                [
-                    player.get("item_0"),
-                    player.get("item_1"),
-                    player.get("item_2"),
-                    player.get("item_3"),
-                    player.get("item_4"),
-                    player.get("item_5"),
-                ],
-            )
-        )
-        lines.append(
-            "Backpack: "
-            + _format_item_list(
-                items,
-                [player.get("backpack_0"), player.get("backpack_1"), player.get("backpack_2")],
-            )
-        )
-        lines.append("Neutral: " + _format_item_list(items, [player.get("item_neutral")]))
-
-    lines.append("")
-    lines.append("Links")
-    lines.append(f"OpenDota match: https://www.opendota.com/matches/{match_id}")
-
-    return "\n".join(lines) + "\n"
+        main_items = _format_item_list(constants, player.items.main)
+        backpack_items = _format_item_list(constants, player.items.backpack)
+        neutral_item = _format_item_list(constants, (player.items.neutral,))
+        item_names = _item_names(player.items, constants)
+
+    ctx = MatchContext(
+        match_id=match.match_id,
+        match_url=f"https://www.opendota.com/matches/{match.match_id}",
+        recording_start=recording_start_utc.isoformat(),
+        match_start=datetime.utcfromtimestamp(match.start_time).isoformat(),
+        duration=_format_duration(match.duration),
+        duration_min=max(1, int(match.duration / 60)),
+        winner="Radiant" if match.radiant_win else "Dire",
+        radiant_score=match.radiant_score,
+        dire_score=match.dire_score,
+        score=f"Radiant {match.radiant_score} - {match.dire_score} Dire",
+        hero=constants.hero_name(player.hero_id) if player else "Dota 2",
+        patch=patch,
+        result="Win" if (match.radiant_win if player_is_radiant else not match.radiant_win) else "Loss",
+        account_id=player_account_id if player else None,
+        kills=player.kills if player else None,
+        deaths=player.deaths if player else None,
+        assists=player.assists if player else None,
+        kda=f"{player.kills}/{player.deaths}/{player.assists}" if player else None,
+        main_items=main_items,
+        backpack_items=backpack_items,
+        neutral_item=neutral_item,
+        items=", ".join(item_names[:12]) or None,
+        item_names=item_names,
+        chapters="\n".join(format_chapters(chapters)) if chapters else None,
+        thumbnail_prompt=None,
+    )
+    return replace(ctx, thumbnail_prompt=_thumbnail_prompt(ctx))
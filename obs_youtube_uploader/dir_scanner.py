@@ -0,0 +1,121 @@
+from __future__ import annotations
+
+import os
+from pathlib import Path
+import threading
+import time
+
+from watchdog.events import FileCreatedEvent, FileSystemEventHandler
+
+
+# Filesystems whose changes made on the host don't reach inotify in the
+# container (Docker Desktop bind mounts, network shares, VM shared folders).
+_NO_EVENT_FSTYPES = {
+    "9p",
+    "drvfs",
+    "fakeowner",
+    "fuse.grpcfuse",
+    "virtiofs",
+    "cifs",
+    "smb3",
+    "smbfs",
+    "nfs",
+    "nfs4",
+    "fuse.sshfs",
+    "vboxsf",
+}
+
+
+def _unescape_mount_path(value: str) -> str:
+    # /proc/mounts escapes space, tab, newline and backslash as octal.
+    for esc, ch in (("\\040", " "), ("\\011", "\t"), ("\\012", "\n"), ("\\134", "\\")):
+        value = value.replace(esc, ch)
+    return value
+
+
+def filesystem_type(path: Path) -> str | None:
+    """Filesystem type of the mount containing ``path`` (Linux only)."""
+    try:
+        lines = Path("/proc/mounts").read_text(encoding="utf-8").splitlines()
+    except OSError:
+        return None
+
+    target = str(path.resolve())
+    best: tuple[int, str] | None = None
+    for line in lines:
+        parts = line.split()
+        if len(parts) < 3:
+            continue
+        mount_point = _unescape_mount_path(parts[1])
+        prefix = mount_point.rstrip("/") + "/"
+        if target == mount_point or target.startswith(prefix):
+            if best is None or len(mount_point) >= best[0]:
+                best = (len(mount_point), parts[2])
+    return best[1] if best else None
+
+
+def supports_native_events(path: Path) -> bool:
+    fstype = filesystem_type(path)
+    return fstype is not None and fstype not in _NO_EVENT_FSTYPES
+
+
+class DirectoryScanner:
+    """Polling fallback that only lists the folder when it has changed.
+
+    Each cycle costs one ``stat`` of the directory. The folder is re-listed
+    only when its mtime moved (or is too recent to trust at coarse mtime
+    granularity), and only names missing from the cached snapshot are
+    reported, as ``FileCreatedEvent``s to ``handler``. Size changes of files
+    being written are left to the stability tracker.
+    """
+
+    def __init__(self, folder: Path, handler: FileSystemEventHandler, *, interval: float):
+        self._folder = folder
+        self._handler = handler
+        self._interval = interval
+        self._names: set[str] = set()
+        self._dir_mtime_ns: int | None = None
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def start(self) -> None:
+        self._scan(initial=True)
+        self._thread = threading.Thread(target=self._run, name="dir-scanner", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def join(self, timeout: float | None = None) -> None:
+        if self._thread is not None:
+            self._thread.join(timeout=timeout)
+
+    def _run(self) -> None:
+        while not self._stop.wait(self._interval):
+            try:
+                self._scan()
+            except OSError as err:
+                print(f"[watcher:scan] error: {err}")
+
+    def _scan(self, *, initial: bool = False) -> None:
+        mtime_ns = os.stat(self._folder).st_mtime_ns
+        # Mount types with 1-2s mtime resolution can hide a second change in
+        # the same tick, so keep re-listing while the mtime is that fresh.
+        recent = time.time_ns() - mtime_ns < int(2 * self._interval * 1e9)
+        if mtime_ns == self._dir_mtime_ns and not recent:
+            return
+        self._dir_mtime_ns = mtime_ns
+
+        started = time.perf_counter()
+        with os.scandir(self._folder) as it:
+            names = {entry.name for entry in it if entry.is_file()}
+        new = sorted(names - self._names)
+        self._names = names
+        took_ms = (time.perf_counter() - started) * 1000
+
+        if initial:
+            print(f"[watcher:scan] entries={len(names)} took={took_ms:.1f}ms (initial)")
+            return
+        print(f"[watcher:scan] entries={len(names)} new={len(new)} took={took_ms:.1f}ms")
+        for name in new:
+            self._handler.dispatch(FileCreatedEvent(str(self._folder / name)))
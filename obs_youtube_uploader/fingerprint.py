@@ -0,0 +1,134 @@
+from __future__ import annotations
+
+import hashlib
+from pathlib import Path
+import queue
+import threading
+import time
+
+from .config import Config
+from .jobs import Job, JobStore, open_job_store
+
+
+# Bytes read from each end of the file for the sampled fingerprint.
+_SAMPLE_BYTES = 1024 * 1024
+
+
+def sampled_fingerprint(path: Path) -> str:
+    """Fast content fingerprint: the size plus a hash of the first and last MiB.
+
+    Reads at most 2 MiB regardless of the file size, so it takes
+    milliseconds even for multi-GB recordings. Recordings of different
+    games differ in their first bytes (container header, timestamps) and
+    in their tail (index, final frames); a copied or renamed file has the
+    same fingerprint.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        size = f.seek(0, 2)
+        f.seek(0)
+        digest.update(f.read(_SAMPLE_BYTES))
+        if size > _SAMPLE_BYTES:
+            f.seek(max(_SAMPLE_BYTES, size - _SAMPLE_BYTES))
+            digest.update(f.read(_SAMPLE_BYTES))
+    return f"{size}:{digest.hexdigest()}"
+
+
+def content_hash(path: Path) -> str:
+    """SHA-256 of the whole file, streamed in fixed-size chunks."""
+    with open(path, "rb") as f:
+        return hashlib.file_digest(f, "sha256").hexdigest()
+
+
+class _Hasher:
+    """Background thread that computes full content hashes, one file at a time.
+
+    Reading whole recordings is disk bound, so a single thread keeps the
+    hashing from competing with uploads for more than one file's worth of
+    I/O.
+    """
+
+    def __init__(self, jobs: JobStore):
+        self._jobs = jobs
+        self._queue: queue.Queue[Job] = queue.Queue()
+        self._queued: set[int] = set()
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, name="hasher", daemon=True)
+        self._thread.start()
+
+    def submit(self, job: Job) -> None:
+        with self._lock:
+            if job.id in self._queued:
+                return
+            self._queued.add(job.id)
+        self._queue.put(job)
+
+    def _run(self) -> None:
+        while True:
+            job = self._queue.get()
+            try:
+                if self._jobs.is_current(job):
+                    self._jobs.set_content_hash(job, content_hash(job.path))
+            except Exception as err:
+                print(f"[hash:error] {job.path.name}: {err}")
+            finally:
+                with self._lock:
+                    self._queued.discard(job.id)
+
+
+_HASHERS: dict[Path, _Hasher] = {}
+_HASHERS_LOCK = threading.Lock()
+
+
+def hash_in_background(config: Config, job: Job) -> None:
+    """Queue the full content hash of ``job``'s recording; it is stored on the job when done."""
+    with _HASHERS_LOCK:
+        hasher = _HASHERS.get(config.data_dir)
+        if hasher is None:
+            hasher = _Hasher(open_job_store(config.data_dir))
+            _HASHERS[config.data_dir] = hasher
+    hasher.submit(job)
+
+
+def ensure_fingerprint(jobs: JobStore, job: Job) -> None:
+    """Record ``job``'s sampled fingerprint if it doesn't have one yet."""
+    if job.fingerprint is None:
+        jobs.set_fingerprint(job, sampled_fingerprint(job.path))
+
+
+def fingerprint_uploaded(jobs: JobStore) -> None:
+    """Fingerprint uploaded recordings that have none yet, so copies of them are recognized too.
+
+    Covers jobs uploaded before fingerprints were recorded or while
+    DEDUPE_UPLOADS was off; recordings no longer on disk are skipped.
+    """
+    started = time.monotonic()
+    done = 0
+    for job in jobs.uploaded_without_fingerprint():
+        if not jobs.is_current(job):
+            continue
+        try:
+            ensure_fingerprint(jobs, job)
+            done += 1
+        except OSError as err:
+            print(f"[dedupe] can't fingerprint {job.path.name}: {err}")
+    if done:
+        print(f"[dedupe] fingerprinted {done} uploaded recording(s) ({time.monotonic() - started:.1f}s)")
+
+
+def find_duplicate(jobs: JobStore, job: Job) -> Job | None:
+    """An already uploaded job of the same profile with the same content as ``job``, if any.
+
+    Matches on the sampled fingerprint; when the full hashes of both
+    files are already known they must agree too.
+    """
+    ensure_fingerprint(jobs, job)
+    # The hasher may have finished since this job was loaded.
+    stored = jobs.get(job.id)
+    own_hash = stored.content_hash if stored is not None else job.content_hash
+    for other in jobs.uploaded_with_fingerprint(job.fingerprint, profile=job.profile, exclude_id=job.id):
+        if own_hash and other.content_hash and own_hash != other.content_hash:
+            print(f"[dedupe] {job.path.name} shares a sampled fingerprint with {other.path.name} but not its content")
+            continue
+        return other
+    return None
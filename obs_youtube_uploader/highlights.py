@@ -0,0 +1,98 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from datetime import datetime
+
+from .match_model import Match, PlayerSummary
+
+
+# Kills less than this many seconds apart count as one multi-kill.
+_MULTI_KILL_GAP_SEC = 18
+_MULTI_KILL_NAMES = {1: "Kill", 2: "Double Kill", 3: "Triple Kill", 4: "Ultra Kill"}
+
+# Lead-in and follow-through around the action, in seconds.
+_KILL_BEFORE_SEC = 10
+_KILL_AFTER_SEC = 5
+_FIGHT_BEFORE_SEC = 5
+_FIGHT_AFTER_SEC = 5
+
+# OpenDota's start_time is when the match loaded; game time 0 (the horn)
+# comes after the strategy phase.
+_DEFAULT_PRE_GAME_SEC = 90
+
+
+@dataclass(frozen=True)
+class Highlight:
+    """A moment worth a clip, in game time (seconds from the horn).
+
+    ``start``/``end`` bound the clip; ``at`` is when the action begins.
+    """
+
+    start: int
+    end: int
+    at: int
+    label: str
+
+
+def _multi_kill_name(kills: int) -> str:
+    return "Rampage" if kills >= 5 else _MULTI_KILL_NAMES[kills]
+
+
+def _multi_kills(player: PlayerSummary, min_kills: int) -> list[Highlight]:
+    times = list(player.kill_times)
+    highlights: list[Highlight] = []
+    streak: list[int] = []
+    for t in times + [None]:
+        if t is not None and streak and t - streak[-1] <= _MULTI_KILL_GAP_SEC:
+            streak.append(t)
+            continue
+        if len(streak) >= min_kills:
+            highlights.append(
+                Highlight(
+                    streak[0] - _KILL_BEFORE_SEC,
+                    streak[-1] + _KILL_AFTER_SEC,
+                    streak[0],
+                    _multi_kill_name(len(streak)),
+                )
+            )
+        streak = [t] if t is not None else []
+    return highlights
+
+
+def _teamfights(match: Match, player_index: int) -> list[Highlight]:
+    """Teamfights the player took part in (dealt damage, got a kill or died)."""
+    highlights: list[Highlight] = []
+    for fight in match.teamfights:
+        if player_index >= len(fight.took_part) or not fight.took_part[player_index]:
+            continue
+        label = f"Teamfight ({fight.deaths} deaths)"
+        highlights.append(Highlight(fight.start - _FIGHT_BEFORE_SEC, fight.end + _FIGHT_AFTER_SEC, fight.start, label))
+    return highlights
+
+
+def find_highlights(match: Match, account_id: int, *, min_kills: int) -> list[Highlight]:
+    """Multi-kills of the player and teamfights they were in, overlapping ones merged, in game order."""
+    index = match.player_index(account_id)
+    if index is None:
+        return []
+
+    found = sorted(_multi_kills(match.players[index], min_kills) + _teamfights(match, index), key=lambda h: h.start)
+    merged: list[Highlight] = []
+    for h in found:
+        if merged and h.start <= merged[-1].end:
+            last = merged[-1]
+            label = last.label if h.label in last.label else f"{last.label} + {h.label}"
+            merged[-1] = Highlight(last.start, max(last.end, h.end), last.at, label)
+        else:
+            merged.append(h)
+    return merged
+
+
+def game_time_offset(match: Match, recording_start_utc: datetime, adjust_sec: float = 0.0) -> float:
+    """Seconds into the recording at which game time 0 falls.
+
+    ``adjust_sec`` corrects for OBS starting late/early relative to the
+    filename timestamp.
+    """
+    pre_game = match.pre_game_duration if match.pre_game_duration is not None else _DEFAULT_PRE_GAME_SEC
+    return match.start_time - recording_start_utc.timestamp() + pre_game + adjust_sec
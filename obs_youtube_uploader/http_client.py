@@ -0,0 +1,198 @@
+from __future__ import annotations
+
+import asyncio
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+import random
+import threading
+import time
+from typing import Any, Callable, Coroutine, Generic, TypeVar
+import weakref
+
+import httpx
+
+
+T = TypeVar("T")
+
+
+class TokenBucket:
+    """Thread-safe token bucket: ``rate_per_sec`` refill, at most ``capacity`` banked.
+
+    Threads wait with ``acquire``, coroutines with ``acquire_async``; both
+    draw from the same budget, whichever event loop they run on.
+    """
+
+    def __init__(self, rate_per_sec: float, capacity: float):
+        self._rate = rate_per_sec
+        self._capacity = max(1.0, capacity)
+        self._tokens = self._capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _take(self, tokens: float) -> float:
+        """Take ``tokens`` and return 0, or return how long to wait before trying again."""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self._capacity, self._tokens + (now - self._updated) * self._rate)
+            self._updated = now
+            if self._tokens >= tokens:
+                self._tokens -= tokens
+                return 0.0
+            return (tokens - self._tokens) / self._rate
+
+    def acquire(self, tokens: float = 1.0) -> None:
+        while (wait := self._take(tokens)) > 0:
+            time.sleep(wait)
+
+    async def acquire_async(self, tokens: float = 1.0) -> None:
+        while (wait := self._take(tokens)) > 0:
+            await asyncio.sleep(wait)
+
+
+def parse_retry_after(value: str | None) -> float | None:
+    """Seconds to wait from a ``Retry-After`` header (delta-seconds or HTTP-date)."""
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return max(0.0, (when - datetime.now(timezone.utc)).total_seconds())
+
+
+@dataclass(frozen=True)
+class RetryPolicy:
+    max_attempts: int = 5
+    base_delay_sec: float = 1.0
+    max_delay_sec: float = 60.0
+    retry_statuses: frozenset[int] = frozenset({429, 500, 502, 503, 504})
+
+    def delay(self, attempt: int, retry_after: str | None = None) -> float:
+        """Backoff before retry number ``attempt`` (1-based), with full jitter.
+
+        A server-provided ``Retry-After`` always wins over the computed backoff.
+        """
+        server_wait = parse_retry_after(retry_after)
+        if server_wait is not None:
+            return server_wait + random.uniform(0, self.base_delay_sec)
+        return random.uniform(0, min(self.max_delay_sec, self.base_delay_sec * (2 ** (attempt - 1))))
+
+
+# Failures worth retrying: the request may never have reached the server.
+_RETRY_EXCEPTIONS = (httpx.TimeoutException, httpx.NetworkError, httpx.RemoteProtocolError)
+
+
+def new_async_client(pool_size: int = 10) -> httpx.AsyncClient:
+    """A keep-alive client with at most ``pool_size`` connections.
+
+    httpx clients belong to the event loop they are first used on; see
+    ``PerLoop``.
+    """
+    limits = httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size)
+    return httpx.AsyncClient(limits=limits)
+
+
+def _timeout(value: float | tuple[float, float]) -> httpx.Timeout:
+    if isinstance(value, tuple):
+        connect, read = value
+        return httpx.Timeout(read, connect=connect)
+    return httpx.Timeout(value)
+
+
+async def request_with_retry(
+    client: httpx.AsyncClient,
+    method: str,
+    url: str,
+    *,
+    policy: RetryPolicy,
+    limiter: TokenBucket | None = None,
+    slots: asyncio.Semaphore | None = None,
+    timeout: float | tuple[float, float],
+    **kwargs: Any,
+) -> httpx.Response:
+    """Send a request, retrying connection errors and ``policy.retry_statuses``.
+
+    ``slots`` caps how many requests are in flight at once. The last
+    response is returned as-is (callers still ``raise_for_status``).
+    """
+    attempt = 1
+    while True:
+        if limiter is not None:
+            await limiter.acquire_async()
+
+        try:
+            if slots is not None:
+                async with slots:
+                    res = await client.request(method, url, timeout=_timeout(timeout), **kwargs)
+            else:
+                res = await client.request(method, url, timeout=_timeout(timeout), **kwargs)
+        except _RETRY_EXCEPTIONS as err:
+            if attempt >= policy.max_attempts:
+                raise
+            delay = policy.delay(attempt)
+            print(f"[http:retry] {method} {url} failed ({err!r}); retry {attempt} in {delay:.1f}s")
+        else:
+            if res.status_code not in policy.retry_statuses or attempt >= policy.max_attempts:
+                return res
+            delay = policy.delay(attempt, res.headers.get("Retry-After"))
+            print(f"[http:retry] {method} {url} -> {res.status_code}; retry {attempt} in {delay:.1f}s")
+
+        await asyncio.sleep(delay)
+        attempt += 1
+
+
+class PerLoop(Generic[T]):
+    """One ``factory()`` result per running event loop.
+
+    httpx clients and asyncio primitives can't be shared between loops, so
+    shared objects that hold them are created lazily for each loop.
+    """
+
+    def __init__(self, factory: Callable[[], T]):
+        self._factory = factory
+        self._items: weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, T] = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+
+    def get(self) -> T:
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            item = self._items.get(loop)
+            if item is None:
+                item = self._factory()
+                self._items[loop] = item
+            return item
+
+
+_LOOP: asyncio.AbstractEventLoop | None = None
+_LOOP_THREAD: threading.Thread | None = None
+_LOOP_LOCK = threading.Lock()
+
+
+def _background_loop() -> asyncio.AbstractEventLoop:
+    global _LOOP, _LOOP_THREAD
+    with _LOOP_LOCK:
+        if _LOOP is None:
+            _LOOP = asyncio.new_event_loop()
+            _LOOP_THREAD = threading.Thread(target=_LOOP.run_forever, name="http-loop", daemon=True)
+            _LOOP_THREAD.start()
+        return _LOOP
+
+
+def run_sync(coro: Coroutine[Any, Any, T]) -> T:
+    """Run ``coro`` on the shared background event loop and wait for its result.
+
+    This is how the synchronous API wraps the async one: every blocking
+    caller's I/O is multiplexed on one loop and its connection pools.
+    """
+    loop = _background_loop()
+    if threading.current_thread() is _LOOP_THREAD:
+        raise RuntimeError("run_sync() called from the background loop; await the coroutine instead")
+    return asyncio.run_coroutine_threadsafe(coro, loop).result()
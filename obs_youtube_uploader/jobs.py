@@ -0,0 +1,297 @@
+from __future__ import annotations
+
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+import json
+from pathlib import Path
+import threading
+import time
+from typing import Any, Iterator
+
+from .sqlite_store import open_sqlite, shared
+
+
+# Pipeline stages in order; a job's ``stage`` is the last one it completed.
+STAGES = ("new", "resolved", "described", "uploaded", "notified")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY,
+    path TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    stage TEXT NOT NULL,
+    match_id INTEGER,
+    title TEXT,
+    tags TEXT,
+    description_path TEXT,
+    video_id TEXT,
+    error TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    upload_uri TEXT,
+    upload_offset INTEGER,
+    profile TEXT,
+    upload_path TEXT,
+    fingerprint TEXT,
+    content_hash TEXT,
+    parent_id INTEGER,
+    UNIQUE (path, size, mtime_ns)
+);
+CREATE INDEX IF NOT EXISTS jobs_stage ON jobs (stage);
+CREATE INDEX IF NOT EXISTS jobs_fingerprint ON jobs (fingerprint);
+"""
+
+_COLUMNS = (
+    "id, path, size, mtime_ns, stage, match_id, title, tags, description_path, video_id, error, created_at, "
+    "upload_uri, upload_offset, profile, upload_path, fingerprint, content_hash, parent_id"
+)
+
+
+@dataclass
+class Job:
+    id: int
+    path: Path
+    size: int
+    mtime_ns: int
+    stage: str
+    created_at: datetime
+    match_id: int | None = None
+    title: str | None = None
+    tags: list[str] = field(default_factory=list)
+    description_path: Path | None = None
+    video_id: str | None = None
+    error: str | None = None
+    # Resumable YouTube upload session and the last byte offset it confirmed.
+    upload_uri: str | None = None
+    upload_offset: int = 0
+    # Config profile (player/channel) the recording belongs to.
+    profile: str = "default"
+    # File to upload instead of ``path`` (a remuxed copy), if any.
+    upload_path: Path | None = None
+    # Sampled content fingerprint and full SHA-256 of the recording, used to spot re-uploads.
+    fingerprint: str | None = None
+    content_hash: str | None = None
+    # For a highlight clip: the job of the recording it was cut from.
+    parent_id: int | None = None
+
+    def reached(self, stage: str) -> bool:
+        return STAGES.index(self.stage) >= STAGES.index(stage)
+
+    @property
+    def done(self) -> bool:
+        return self.stage == STAGES[-1]
+
+
+def _row_to_job(row: tuple[Any, ...]) -> Job:
+    return Job(
+        id=row[0],
+        path=Path(row[1]),
+        size=row[2],
+        mtime_ns=row[3],
+        stage=row[4],
+        match_id=row[5],
+        title=row[6],
+        tags=json.loads(row[7]) if row[7] else [],
+        description_path=Path(row[8]) if row[8] else None,
+        video_id=row[9],
+        error=row[10],
+        created_at=datetime.fromtimestamp(row[11], timezone.utc),
+        upload_uri=row[12],
+        upload_offset=row[13] or 0,
+        profile=row[14] or "default",
+        upload_path=Path(row[15]) if row[15] else None,
+        fingerprint=row[16],
+        content_hash=row[17],
+        parent_id=row[18],
+    )
+
+
+class JobStore:
+    """Durable record of every recording the pipeline has seen.
+
+    A job is keyed by (path, size, mtime), so a re-recorded file with the
+    same name is a new job while a restart finds the existing one and can
+    continue from the first stage it hasn't completed.
+    """
+
+    def __init__(self, path: Path):
+        self._db = open_sqlite(path, _SCHEMA)
+        self._lock = threading.Lock()
+        # (profile, fingerprint) -> id of the job uploading it right now.
+        self._claims: dict[tuple[str, str], int] = {}
+        self._claims_changed = threading.Condition(self._lock)
+
+    def find(self, video_path: Path) -> Job | None:
+        """The job for the file as it is on disk now (None if unseen or changed)."""
+        try:
+            st = video_path.stat()
+        except FileNotFoundError:
+            return None
+        with self._lock:
+            row = self._db.execute(
+                f"SELECT {_COLUMNS} FROM jobs WHERE path = ? AND size = ? AND mtime_ns = ?",
+                (str(video_path), st.st_size, st.st_mtime_ns),
+            ).fetchone()
+        return _row_to_job(row) if row else None
+
+    def get(self, job_id: int) -> Job | None:
+        with self._lock:
+            row = self._db.execute(f"SELECT {_COLUMNS} FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return _row_to_job(row) if row else None
+
+    def job_for(self, video_path: Path, *, profile: str = "default", parent_id: int | None = None) -> Job:
+        """Existing job for the file, or a new one at stage ``new`` for ``profile``."""
+        st = video_path.stat()
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "INSERT OR IGNORE INTO jobs (path, size, mtime_ns, stage, created_at, updated_at, profile, parent_id) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (str(video_path), st.st_size, st.st_mtime_ns, STAGES[0], now, now, profile, parent_id),
+            )
+            row = self._db.execute(
+                f"SELECT {_COLUMNS} FROM jobs WHERE path = ? AND size = ? AND mtime_ns = ?",
+                (str(video_path), st.st_size, st.st_mtime_ns),
+            ).fetchone()
+        return _row_to_job(row)
+
+    def advance(self, job: Job, stage: str, **fields: Any) -> None:
+        """Record that ``job`` completed ``stage``, along with any new field values."""
+        job.stage = stage
+        job.error = None
+        for name, value in fields.items():
+            setattr(job, name, value)
+
+        with self._lock:
+            self._db.execute(
+                "UPDATE jobs SET stage = ?, match_id = ?, title = ?, tags = ?, description_path = ?, "
+                "video_id = ?, upload_uri = ?, upload_offset = ?, upload_path = ?, error = NULL, updated_at = ? "
+                "WHERE id = ?",
+                (
+                    job.stage,
+                    job.match_id,
+                    job.title,
+                    json.dumps(job.tags),
+                    str(job.description_path) if job.description_path else None,
+                    job.video_id,
+                    job.upload_uri,
+                    job.upload_offset,
+                    str(job.upload_path) if job.upload_path else None,
+                    time.time(),
+                    job.id,
+                ),
+            )
+
+    def save_upload_session(self, job: Job, uri: str, offset: int) -> None:
+        """Remember where an in-progress upload is, so a restart can resume it."""
+        job.upload_uri = uri
+        job.upload_offset = offset
+        with self._lock:
+            self._db.execute(
+                "UPDATE jobs SET upload_uri = ?, upload_offset = ?, updated_at = ? WHERE id = ?",
+                (uri, offset, time.time(), job.id),
+            )
+
+    def set_upload_path(self, job: Job, upload_path: Path | None) -> None:
+        """Upload ``upload_path`` instead of the recording; any upload session for the old file is dropped."""
+        job.upload_path = upload_path
+        job.upload_uri = None
+        job.upload_offset = 0
+        with self._lock:
+            self._db.execute(
+                "UPDATE jobs SET upload_path = ?, upload_uri = NULL, upload_offset = 0, updated_at = ? WHERE id = ?",
+                (str(upload_path) if upload_path else None, time.time(), job.id),
+            )
+
+    def set_fingerprint(self, job: Job, fingerprint: str) -> None:
+        job.fingerprint = fingerprint
+        with self._lock:
+            self._db.execute(
+                "UPDATE jobs SET fingerprint = ?, updated_at = ? WHERE id = ?", (fingerprint, time.time(), job.id)
+            )
+
+    def set_content_hash(self, job: Job, content_hash: str) -> None:
+        job.content_hash = content_hash
+        with self._lock:
+            self._db.execute(
+                "UPDATE jobs SET content_hash = ?, updated_at = ? WHERE id = ?", (content_hash, time.time(), job.id)
+            )
+
+    def uploaded_with_fingerprint(self, fingerprint: str, *, profile: str, exclude_id: int) -> list[Job]:
+        """Jobs of ``profile`` with this fingerprint that have a YouTube video, oldest first."""
+        with self._lock:
+            rows = self._db.execute(
+                f"SELECT {_COLUMNS} FROM jobs WHERE fingerprint = ? AND profile = ? AND video_id IS NOT NULL "
+                "AND id != ? ORDER BY created_at",
+                (fingerprint, profile, exclude_id),
+            ).fetchall()
+        return [_row_to_job(r) for r in rows]
+
+    def uploaded_without_fingerprint(self) -> list[Job]:
+        """Uploaded jobs from before fingerprints were recorded (or with deduplication off)."""
+        with self._lock:
+            rows = self._db.execute(
+                f"SELECT {_COLUMNS} FROM jobs WHERE fingerprint IS NULL AND video_id IS NOT NULL ORDER BY id"
+            ).fetchall()
+        return [_row_to_job(r) for r in rows]
+
+    @contextmanager
+    def upload_claim(self, job: Job) -> Iterator[None]:
+        """Hold ``job``'s fingerprint within its profile while it uploads.
+
+        Another job of the same profile with the same fingerprint waits here
+        until this one is done, and can then find it as an uploaded duplicate
+        instead of uploading the same content at the same time.
+        """
+        if job.fingerprint is None:
+            yield
+            return
+        key = (job.profile, job.fingerprint)
+        with self._claims_changed:
+            while self._claims.get(key, job.id) != job.id:
+                self._claims_changed.wait()
+            self._claims[key] = job.id
+        try:
+            yield
+        finally:
+            with self._claims_changed:
+                del self._claims[key]
+                self._claims_changed.notify_all()
+
+    def clips_of(self, job: Job) -> list[Job]:
+        """Highlight clip jobs cut from ``job``'s recording."""
+        with self._lock:
+            rows = self._db.execute(
+                f"SELECT {_COLUMNS} FROM jobs WHERE parent_id = ? ORDER BY id", (job.id,)
+            ).fetchall()
+        return [_row_to_job(r) for r in rows]
+
+    def fail(self, job: Job, error: str) -> None:
+        job.error = error
+        with self._lock:
+            self._db.execute(
+                "UPDATE jobs SET error = ?, updated_at = ? WHERE id = ?", (error, time.time(), job.id)
+            )
+
+    def pending(self) -> list[Job]:
+        """Unfinished jobs, oldest first."""
+        with self._lock:
+            rows = self._db.execute(
+                f"SELECT {_COLUMNS} FROM jobs WHERE stage != ? ORDER BY created_at", (STAGES[-1],)
+            ).fetchall()
+        return [_row_to_job(r) for r in rows]
+
+    def is_current(self, job: Job) -> bool:
+        """True if the job's file still exists unchanged on disk."""
+        try:
+            st = job.path.stat()
+        except FileNotFoundError:
+            return False
+        return st.st_size == job.size and st.st_mtime_ns == job.mtime_ns
+
+
+def open_job_store(data_dir: Path) -> JobStore:
+    """Shared store at ``<data_dir>/jobs.sqlite3``."""
+    return shared(JobStore, data_dir / "jobs.sqlite3")
@@ -1,11 +1,13 @@
 from __future__ import annotations
 
+from . import opendota
 from .config import load_config
 from .watcher import run_watcher
 
 
 def main() -> None:
     config = load_config()
+    opendota.configure(config)
     run_watcher(config)
 
 
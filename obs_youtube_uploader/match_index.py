@@ -0,0 +1,149 @@
+from __future__ import annotations
+
+from pathlib import Path
+import threading
+import time
+
+from .opendota import (
+    RecentMatch,
+    Resolution,
+    fetch_player_matches,
+    pick_match_for_recording_time,
+    resolve_many,
+)
+from .sqlite_store import open_sqlite, shared, transaction
+
+
+# Upper bound on how long after its start a match can still be missing from
+# OpenDota (match length + parse delay). Only recordings this recent can be
+# explained by matches newer than the last sync.
+_MAX_MATCH_LAG_SEC = 3 * 60 * 60
+
+# Don't re-sync more often than this, however many recordings miss.
+_MIN_SYNC_INTERVAL_SEC = 60
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS matches (
+    match_id INTEGER PRIMARY KEY,
+    start_time INTEGER NOT NULL,
+    duration INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS matches_start_time ON matches (start_time);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+"""
+
+
+class MatchIndex:
+    """Local SQLite copy of a player's match history.
+
+    Rows are (match_id, start_time, duration). The first sync downloads the
+    full history; later syncs only ask OpenDota for the days since the last
+    one. Lookups are a range query on the ``start_time`` index.
+    """
+
+    def __init__(self, path: Path, player_id: int):
+        self.player_id = player_id
+        self._db = open_sqlite(path, _SCHEMA)
+        self._lock = threading.Lock()
+        self._last_attempt = 0.0
+
+    @property
+    def last_sync(self) -> int | None:
+        row = self._db.execute("SELECT value FROM meta WHERE key = 'last_sync'").fetchone()
+        return int(row[0]) if row else None
+
+    def sync(self) -> int:
+        """Fetch matches newer than the last sync; returns the number of rows fetched."""
+        with self._lock:
+            return self._sync_locked()
+
+    def _sync_locked(self) -> int:
+        now = int(time.time())
+        last_sync = self.last_sync
+        self._last_attempt = time.monotonic()
+
+        if last_sync is None:
+            rows = fetch_player_matches(self.player_id, limit=None)
+        else:
+            days = (now - last_sync) // (24 * 60 * 60) + 2
+            rows = fetch_player_matches(self.player_id, limit=None, date_days=days)
+
+        with transaction(self._db):
+            self._db.executemany(
+                "INSERT OR REPLACE INTO matches (match_id, start_time, duration) VALUES (?, ?, ?)",
+                [(m.match_id, m.start_time, m.duration) for m in rows],
+            )
+            self._db.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('last_sync', ?)", (now,))
+
+        print(f"[match-index] player={self.player_id} synced {len(rows)} matches")
+        return len(rows)
+
+    def matches_between(self, start_from: int, start_to: int) -> list[RecentMatch]:
+        """Matches whose start_time lies in [start_from, start_to], ordered by start."""
+        rows = self._db.execute(
+            "SELECT match_id, start_time, duration FROM matches "
+            "WHERE start_time BETWEEN ? AND ? ORDER BY start_time",
+            (start_from, start_to),
+        ).fetchall()
+        return [RecentMatch(match_id=r[0], start_time=r[1], duration=r[2]) for r in rows]
+
+    def _candidates(self, first: int, last: int, before_start_sec: int, after_end_sec: int) -> list[RecentMatch]:
+        # A match fits a recording at t if start - before <= t <= start + duration + after.
+        # The index narrows on start_time; the duration bound uses the
+        # longest match we have seen.
+        row = self._db.execute("SELECT MAX(duration) FROM matches").fetchone()
+        max_duration = int(row[0] or 0)
+        return self.matches_between(first - after_end_sec - max_duration, last + before_start_sec)
+
+    def find(self, epoch: int, *, before_start_sec: int, after_end_sec: int) -> int | None:
+        """Match id closest to ``epoch``, syncing the gap since the last sync if needed."""
+        window = {"before_start_sec": before_start_sec, "after_end_sec": after_end_sec}
+
+        with self._lock:
+            last_sync = self.last_sync
+            if last_sync is None:
+                self._sync_locked()
+            else:
+                match_id = pick_match_for_recording_time(
+                    self._candidates(epoch, epoch, before_start_sec, after_end_sec), epoch, **window
+                )
+                if match_id:
+                    return match_id
+
+                could_be_newer = last_sync < epoch + before_start_sec + _MAX_MATCH_LAG_SEC
+                recently_tried = time.monotonic() - self._last_attempt < _MIN_SYNC_INTERVAL_SEC
+                if not could_be_newer or recently_tried:
+                    return None
+                self._sync_locked()
+
+            return pick_match_for_recording_time(
+                self._candidates(epoch, epoch, before_start_sec, after_end_sec), epoch, **window
+            )
+
+    def resolve_many(self, epochs: list[int], *, before_start_sec: int, after_end_sec: int) -> Resolution:
+        """Resolve a batch of recordings with one range query and one sweep.
+
+        Syncs at most once, and only if the newest recording could belong to
+        a match newer than the last sync.
+        """
+        if not epochs:
+            return Resolution(assignments={}, conflicts={})
+
+        with self._lock:
+            last_sync = self.last_sync
+            if last_sync is None or last_sync < max(epochs) + before_start_sec + _MAX_MATCH_LAG_SEC:
+                recently_tried = time.monotonic() - self._last_attempt < _MIN_SYNC_INTERVAL_SEC
+                if last_sync is None or not recently_tried:
+                    self._sync_locked()
+
+            matches = self._candidates(min(epochs), max(epochs), before_start_sec, after_end_sec)
+
+        return resolve_many(matches, epochs, before_start_sec=before_start_sec, after_end_sec=after_end_sec)
+
+
+def get_match_index(data_dir: Path, player_id: int) -> MatchIndex:
+    """Shared per-player index stored at ``<data_dir>/matches_<player_id>.sqlite3``."""
+    return shared(MatchIndex, data_dir / f"matches_{player_id}.sqlite3", player_id)
@@ -0,0 +1,142 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Any
+
+
+# OpenDota's match payload carries every player's full logs (often
+# hundreds of KB); ``parse_match`` decodes it once into these compact
+# records, keeping only what the pipeline reads, and the raw dict is dropped.
+
+
+def _int(value: Any, default: int = 0) -> int:
+    try:
+        return int(value) if value is not None else default
+    except (TypeError, ValueError):
+        return default
+
+
+@dataclass(frozen=True, slots=True)
+class ItemSlots:
+    """Item ids at the end of the match; 0 is an empty slot."""
+
+    main: tuple[int, ...]
+    backpack: tuple[int, ...]
+    neutral: int
+
+
+@dataclass(frozen=True, slots=True)
+class PlayerSummary:
+    account_id: int | None
+    player_slot: int
+    hero_id: int
+    kills: int
+    deaths: int
+    assists: int
+    items: ItemSlots
+    # Game times of the player's kills, in order.
+    kill_times: tuple[int, ...]
+
+    @property
+    def is_radiant(self) -> bool:
+        return self.player_slot < 128
+
+
+@dataclass(frozen=True, slots=True)
+class Teamfight:
+    start: int
+    end: int
+    deaths: int
+    # Per player (in ``Match.players`` order): dealt damage, got a kill or died.
+    took_part: tuple[bool, ...]
+
+
+@dataclass(frozen=True, slots=True)
+class Objective:
+    time: int
+    type: str
+    key: str
+
+
+@dataclass(frozen=True, slots=True)
+class Match:
+    match_id: int
+    start_time: int
+    duration: int
+    # None when OpenDota hasn't parsed the replay.
+    pre_game_duration: int | None
+    radiant_win: bool
+    radiant_score: int
+    dire_score: int
+    patch: int | None
+    players: tuple[PlayerSummary, ...]
+    # Both in time order.
+    teamfights: tuple[Teamfight, ...]
+    objectives: tuple[Objective, ...]
+
+    def player(self, account_id: int) -> PlayerSummary | None:
+        for p in self.players:
+            if p.account_id == account_id:
+                return p
+        return None
+
+    def player_index(self, account_id: int) -> int | None:
+        return next((i for i, p in enumerate(self.players) if p.account_id == account_id), None)
+
+
+def _parse_player(p: dict[str, Any]) -> PlayerSummary:
+    account_id = p.get("account_id")
+    return PlayerSummary(
+        account_id=_int(account_id) if account_id is not None else None,
+        player_slot=_int(p.get("player_slot")),
+        hero_id=_int(p.get("hero_id")),
+        kills=_int(p.get("kills")),
+        deaths=_int(p.get("deaths")),
+        assists=_int(p.get("assists")),
+        items=ItemSlots(
+            main=tuple(_int(p.get(f"item_{i}")) for i in range(6)),
+            backpack=tuple(_int(p.get(f"backpack_{i}")) for i in range(3)),
+            neutral=_int(p.get("item_neutral")),
+        ),
+        kill_times=tuple(sorted(_int(k["time"]) for k in p.get("kills_log") or [] if k.get("time") is not None)),
+    )
+
+
+def _took_part(me: dict[str, Any]) -> bool:
+    return bool(sum((me.get("killed") or {}).values()) or me.get("deaths") or me.get("damage"))
+
+
+def _parse_teamfight(fight: dict[str, Any]) -> Teamfight:
+    return Teamfight(
+        start=_int(fight.get("start")),
+        end=_int(fight.get("end")),
+        deaths=_int(fight.get("deaths")),
+        took_part=tuple(_took_part(me) for me in fight.get("players") or []),
+    )
+
+
+def parse_match(data: dict[str, Any]) -> Match:
+    """Decode an OpenDota ``/matches/<id>`` response."""
+    pre_game = data.get("pre_game_duration")
+    patch = data.get("patch")
+    return Match(
+        match_id=_int(data.get("match_id")),
+        start_time=_int(data.get("start_time")),
+        duration=_int(data.get("duration")),
+        pre_game_duration=_int(pre_game) if pre_game is not None else None,
+        radiant_win=bool(data.get("radiant_win")),
+        radiant_score=_int(data.get("radiant_score")),
+        dire_score=_int(data.get("dire_score")),
+        patch=_int(patch) if patch is not None else None,
+        players=tuple(_parse_player(p) for p in data.get("players") or []),
+        teamfights=tuple(sorted((_parse_teamfight(f) for f in data.get("teamfights") or []), key=lambda f: f.start)),
+        objectives=tuple(
+            sorted(
+                (
+                    Objective(time=_int(o.get("time")), type=str(o.get("type") or ""), key=str(o.get("key") or ""))
+                    for o in data.get("objectives") or []
+                ),
+                key=lambda o: o.time,
+            )
+        ),
+    )
@@ -1,11 +1,139 @@
 from __future__ import annotations
 
-from datetime import datetime
+from datetime import datetime, timezone
+from pathlib import Path
+import threading
+import time
 from typing import Any
 
-import requests
+import httpx
 
 from .config import Config
+from .http_client import PerLoop, RetryPolicy, new_async_client, request_with_retry, run_sync
+from .outbox import Outbox, OutboxEvent, open_outbox
+
+
+_CLIENTS = PerLoop(lambda: new_async_client(pool_size=4))
+# One POST per delivery attempt; retries are scheduled through the outbox.
+_POST = RetryPolicy(max_attempts=1)
+# Backoff between delivery attempts of an event.
+_BACKOFF = RetryPolicy(base_delay_sec=5.0, max_delay_sec=15 * 60.0)
+# 4xx answers that may succeed later; any other 4xx rejects the event for good.
+_RETRY_4XX = frozenset({408, 429})
+
+
+async def apost_events(url: str, payloads: list[dict[str, Any]]) -> httpx.Response:
+    """POST one event as-is, or several as ``{"events": [...]}``."""
+    body: Any = payloads[0] if len(payloads) == 1 else {"events": payloads}
+    return await request_with_retry(_CLIENTS.get(), "POST", url, policy=_POST, timeout=(5.0, 30.0), json=body)
+
+
+class _Sender:
+    """Background thread that drains the outbox, oldest events first.
+
+    Up to ``batch_size`` due events for the same URL go out in one POST.
+    A failed POST reschedules its events with exponential backoff (or the
+    receiver's ``Retry-After``), up to ``max_attempts`` tries. An event the
+    receiver rejects (4xx other than 408/429) is marked failed at once; a
+    rejected batch is retried event by event first, so one bad event
+    doesn't hold back the rest.
+    """
+
+    def __init__(self, outbox: Outbox, batch_size: int, max_attempts: int):
+        self._outbox = outbox
+        self._batch_size = max(1, batch_size)
+        self._max_attempts = max(1, max_attempts)
+        self._wake = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="notify", daemon=True)
+        self._thread.start()
+
+    def wake(self) -> None:
+        self._wake.set()
+
+    def _run(self) -> None:
+        while True:
+            events = self._outbox.due(limit=self._batch_size * 10)
+            if not events:
+                next_due = self._outbox.next_due_at()
+                timeout = None if next_due is None else max(0.0, next_due - time.time())
+                self._wake.wait(timeout=timeout)
+                self._wake.clear()
+                continue
+
+            by_url: dict[str, list[OutboxEvent]] = {}
+            for event in events:
+                by_url.setdefault(event.url, []).append(event)
+            for url, url_events in by_url.items():
+                for i in range(0, len(url_events), self._batch_size):
+                    self._deliver(url, url_events[i : i + self._batch_size])
+
+    def _deliver(self, url: str, events: list[OutboxEvent]) -> None:
+        retry_after: str | None = None
+        rejected = False
+        try:
+            res = run_sync(apost_events(url, [e.payload for e in events]))
+            if res.is_success:
+                self._outbox.delivered(events)
+                return
+            retry_after = res.headers.get("Retry-After")
+            error = f"HTTP {res.status_code}"
+            rejected = 400 <= res.status_code < 500 and res.status_code not in _RETRY_4XX
+        except Exception as err:
+            error = repr(err)
+
+        if rejected and len(events) > 1:
+            print(f"[notify:split] batch of {len(events)} to {url} rejected ({error}); sending one by one")
+            for event in events:
+                self._deliver(url, [event])
+            return
+
+        attempt = max(e.attempts for e in events) + 1
+        if rejected or attempt >= self._max_attempts:
+            ids = ", ".join(str(e.id) for e in events)
+            print(f"[notify:failed] event(s) {ids} to {url} failed ({error}) after {attempt} attempt(s); giving up")
+            self._outbox.give_up(events, error)
+            return
+        delay = _BACKOFF.delay(attempt, retry_after)
+        print(f"[notify:retry] {len(events)} event(s) to {url} failed ({error}); attempt {attempt}, next in {delay:.0f}s")
+        self._outbox.retry_later(events, error, delay)
+
+
+_SENDERS: dict[Path, _Sender] = {}
+_SENDERS_LOCK = threading.Lock()
+
+
+def _sender(config: Config) -> _Sender:
+    with _SENDERS_LOCK:
+        sender = _SENDERS.get(config.data_dir)
+        if sender is None:
+            sender = _Sender(open_outbox(config.data_dir), config.webhook_batch_size, config.webhook_max_attempts)
+            _SENDERS[config.data_dir] = sender
+        return sender
+
+
+def start_notifier(config: Config) -> None:
+    """Start delivering queued events, including any left over from a previous run."""
+    _sender(config).wake()
+
+
+def flush_notifications(config: Config, timeout: float) -> int:
+    """Wait up to ``timeout`` seconds for the outbox to empty; returns how many events are left.
+
+    Events that were given up on don't count.
+    """
+    outbox = open_outbox(config.data_dir)
+    _sender(config).wake()
+    deadline = time.monotonic() + timeout
+    while (left := outbox.pending()) and time.monotonic() < deadline:
+        time.sleep(0.2)
+    return left
+
+
+def _enqueue(config: Config, payload: dict[str, Any]) -> None:
+    if config.dry_run:
+        return
+    open_outbox(config.data_dir).add(config.n8n_webhook_url, payload)
+    _sender(config).wake()
 
 
 def send_finished_notification(
@@ -20,10 +148,9 @@ def send_finished_notification(
     youtube_video_id: str | None,
     error: str | None = None,
 ) -> None:
-    if config.dry_run:
-        return
-
+    """Queue the final success/error event; it is delivered in the background."""
     payload: dict[str, Any] = {
+        "event": "finished",
         "status": status,
         "startedAt": started_at.isoformat() + "Z",
         "finishedAt": finished_at.isoformat() + "Z",
@@ -32,7 +159,28 @@ def send_finished_notification(
         "matchId": match_id,
         "youtubeVideoId": youtube_video_id,
         "error": error,
+        "profile": config.profile,
     }
+    _enqueue(config, payload)
 
-    res = requests.post(config.n8n_webhook_url, json=payload, timeout=30)
-    res.raise_for_status()
+
+def send_stage_event(
+    config: Config,
+    event: str,
+    *,
+    video_path: str,
+    match_id: int | None,
+    youtube_video_id: str | None = None,
+) -> None:
+    """Queue a progress event (``resolved``, ``uploading``, ``uploaded``) if enabled."""
+    if not config.webhook_stage_events:
+        return
+    payload: dict[str, Any] = {
+        "event": event,
+        "at": datetime.now(timezone.utc).isoformat(),
+        "videoPath": video_path,
+        "matchId": match_id,
+        "youtubeVideoId": youtube_video_id,
+        "profile": config.profile,
+    }
+    _enqueue(config, payload)
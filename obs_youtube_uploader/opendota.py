@@ -1,9 +1,107 @@
 from __future__ import annotations
 
+import asyncio
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
 from dataclasses import dataclass
+import heapq
+import threading
 from typing import Any
 
-import requests
+import httpx
+
+from .config import Config
+from .constants import ConstantsIndex, index_heroes, index_items, index_patches
+from .constants_cache import ConstantsCache
+from .http_client import PerLoop, RetryPolicy, TokenBucket, new_async_client, request_with_retry, run_sync
+from .match_model import Match, parse_match
+
+
+_API_BASE = "https://api.opendota.com/api"
+
+
+@dataclass
+class _LoopState:
+    http: httpx.AsyncClient
+    slots: asyncio.Semaphore
+
+
+class OpenDotaClient:
+    """Pooled, rate-limited, retrying HTTP client for the OpenDota API.
+
+    Requests go through httpx: coroutines await ``aget``/``aget_json``,
+    threads call ``get``/``get_json``, which run the same request on the
+    shared background event loop. One instance is shared by the whole
+    process, so every caller draws from the same rate-limit budget; each
+    event loop gets its own keep-alive pool with at most ``max_concurrency``
+    requests in flight.
+    """
+
+    # (connect, read) timeouts per endpoint group. The items constants
+    # payload is large, so constants get a longer read timeout.
+    DEFAULT_TIMEOUTS: dict[str, tuple[float, float]] = {
+        "constants": (5.0, 60.0),
+        "match": (5.0, 30.0),
+        "player": (5.0, 30.0),
+    }
+
+    def __init__(
+        self,
+        *,
+        rate_per_min: float = 60.0,
+        burst: float = 10.0,
+        max_concurrency: int = 10,
+        retry: RetryPolicy | None = None,
+        timeouts: dict[str, tuple[float, float]] | None = None,
+    ):
+        self._state = PerLoop(
+            lambda: _LoopState(http=new_async_client(max_concurrency), slots=asyncio.Semaphore(max_concurrency))
+        )
+        self._limiter = TokenBucket(rate_per_min / 60.0, burst)
+        self._retry = retry or RetryPolicy()
+        self._timeouts = {**self.DEFAULT_TIMEOUTS, **(timeouts or {})}
+
+    async def aget(
+        self,
+        path: str,
+        *,
+        endpoint: str,
+        params: dict[str, Any] | None = None,
+        headers: dict[str, str] | None = None,
+    ) -> httpx.Response:
+        state = self._state.get()
+        return await request_with_retry(
+            state.http,
+            "GET",
+            f"{_API_BASE}/{path}",
+            policy=self._retry,
+            limiter=self._limiter,
+            slots=state.slots,
+            timeout=self._timeouts[endpoint],
+            params=params,
+            headers=headers,
+        )
+
+    async def aget_json(self, path: str, *, endpoint: str, params: dict[str, Any] | None = None) -> Any:
+        res = await self.aget(path, endpoint=endpoint, params=params)
+        res.raise_for_status()
+        return res.json()
+
+    def get(
+        self,
+        path: str,
+        *,
+        endpoint: str,
+        params: dict[str, Any] | None = None,
+        headers: dict[str, str] | None = None,
+    ) -> httpx.Response:
+        return run_sync(self.aget(path, endpoint=endpoint, params=params, headers=headers))
+
+    def get_json(self, path: str, *, endpoint: str, params: dict[str, Any] | None = None) -> Any:
+        return run_sync(self.aget_json(path, endpoint=endpoint, params=params))
+
+
+_CLIENT = OpenDotaClient()
 
 
 @dataclass(frozen=True)
@@ -13,11 +111,7 @@ class RecentMatch:
     duration: int
 
 
-def fetch_recent_matches(player_id: int) -> list[RecentMatch]:
-    url = f"https://api.opendota.com/api/players/{player_id}/recentMatches"
-    res = requests.get(url, timeout=30)
-    res.raise_for_status()
-    data = res.json()
+def _parse_matches(data: list[dict[str, Any]]) -> list[RecentMatch]:
     out: list[RecentMatch] = []
     for row in data:
         out.append(
@@ -30,85 +124,255 @@ def fetch_recent_matches(player_id: int) -> list[RecentMatch]:
     return out
 
 
-def fetch_player_matches(player_id: int, *, limit: int = 200, date_days: int | None = None) -> list[RecentMatch]:
-    params: dict[str, Any] = {"limit": limit}
+async def afetch_player_matches(
+    player_id: int, *, limit: int | None = 200, date_days: int | None = None
+) -> list[RecentMatch]:
+    """Player match history; ``limit=None`` returns every match OpenDota has."""
+    params: dict[str, Any] = {}
+    if limit is not None:
+        params["limit"] = int(limit)
     if date_days is not None:
         params["date"] = int(date_days)
 
-    url = f"https://api.opendota.com/api/players/{player_id}/matches"
-    res = requests.get(url, params=params, timeout=30)
-    res.raise_for_status()
+    data = await _CLIENT.aget_json(f"players/{player_id}/matches", endpoint="player", params=params)
+    return _parse_matches(data)
 
-    data = res.json()
-    out: list[RecentMatch] = []
-    for row in data:
-        out.append(
-            RecentMatch(
-                match_id=int(row["match_id"]),
-                start_time=int(row["start_time"]),
-                duration=int(row["duration"]),
-            )
-        )
-    return out
 
+# Recently fetched matches, least recently used first. Describing a recording
+# and cutting its highlights both need the match, so they share one request.
+# Matches OpenDota hasn't parsed yet aren't kept: their timeline may still come.
+_MATCH_CACHE_SIZE = 64
+_MATCHES: OrderedDict[int, Match] = OrderedDict()
+_MATCHES_LOCK = threading.Lock()
 
-def fetch_match(match_id: int) -> dict[str, Any]:
-    url = f"https://api.opendota.com/api/matches/{match_id}"
-    res = requests.get(url, timeout=30)
-    res.raise_for_status()
-    return res.json()
 
+async def afetch_match(match_id: int) -> Match:
+    with _MATCHES_LOCK:
+        match = _MATCHES.get(match_id)
+        if match is not None:
+            _MATCHES.move_to_end(match_id)
+            return match
+    match = parse_match(await _CLIENT.aget_json(f"matches/{match_id}", endpoint="match"))
+    if match.pre_game_duration is None:
+        return match
+    with _MATCHES_LOCK:
+        _MATCHES[match_id] = match
+        while len(_MATCHES) > _MATCH_CACHE_SIZE:
+            _MATCHES.popitem(last=False)
+    return match
 
-_PATCHES_CACHE: list[dict[str, Any]] | None = None
 
+def fetch_player_matches(
+    player_id: int, *, limit: int | None = 200, date_days: int | None = None
+) -> list[RecentMatch]:
+    return run_sync(afetch_player_matches(player_id, limit=limit, date_days=date_days))
 
-def fetch_patches() -> list[dict[str, Any]]:
-    global _PATCHES_CACHE
-    if _PATCHES_CACHE is not None:
-        return _PATCHES_CACHE
 
-    url = "https://api.opendota.com/api/constants/patch"
-    res = requests.get(url, timeout=30)
-    res.raise_for_status()
-    data = res.json()
-    if not isinstance(data, list):
-        raise RuntimeError("Unexpected patch constants payload")
+def fetch_match(match_id: int) -> Match:
+    return run_sync(afetch_match(match_id))
+
+
+# How long to keep serving a stale copy before retrying after a failed refresh.
+_STALE_RETRY_SEC = 5 * 60
+
+# One lock per constants resource, so heroes/items/patches load concurrently
+# while two callers never refresh the same resource at once.
+_CONSTANT_LOCKS = {resource: threading.Lock() for resource in ("heroes", "items", "patch")}
+_CONSTANTS_CACHE = ConstantsCache(None, {})
+
+# Runs the heroes/items/patches loads started by ``submit_constants``. Its
+# threads never wait on other futures, so any caller can wait on its work.
+_FETCH_POOL = ThreadPoolExecutor(max_workers=6, thread_name_prefix="opendota-fetch")
+
 
-    _PATCHES_CACHE = data
-    return _PATCHES_CACHE
+def configure(config: Config) -> None:
+    """Set up the shared API client and the constants cache from ``config``."""
+    global _CLIENT, _CONSTANTS_CACHE
+    _CLIENT = OpenDotaClient(
+        rate_per_min=config.opendota_rate_per_min,
+        max_concurrency=config.opendota_max_concurrency,
+    )
+    for lock in _CONSTANT_LOCKS.values():
+        lock.acquire()
+    try:
+        _CONSTANTS_CACHE = ConstantsCache(config.constants_cache_dir, config.constants_ttl_sec)
+    finally:
+        for lock in _CONSTANT_LOCKS.values():
+            lock.release()
+
+
+def _fetch_constant(resource: str, kind: type) -> Any:
+    """Return a constants payload from cache, revalidating it once its TTL expires.
+
+    Falls back to the stale cached copy if OpenDota can't be reached.
+    Callers must hold ``_CONSTANT_LOCKS[resource]``.
+    """
+    cache = _CONSTANTS_CACHE
+    entry = cache.load(resource)
+    if entry is not None and cache.is_fresh(resource, entry):
+        return entry.data
+
+    try:
+        res = _CLIENT.get(f"constants/{resource}", endpoint="constants", headers=cache.conditional_headers(entry))
+        if res.status_code == 304 and entry is not None:
+            return cache.touch(resource, entry).data
+        res.raise_for_status()
+        data = res.json()
+        if not isinstance(data, kind):
+            raise RuntimeError(f"Unexpected {resource} constants payload")
+    except Exception as err:
+        if entry is None:
+            raise
+        print(f"[opendota:constants] {resource} refresh failed, using cached copy: {err}")
+        cache.defer(entry, _STALE_RETRY_SEC)
+        return entry.data
+
+    entry = cache.store(
+        resource,
+        data,
+        etag=res.headers.get("ETag"),
+        last_modified=res.headers.get("Last-Modified"),
+    )
+    print(f"[opendota:constants] refreshed {resource}")
+    return entry.data
+
+
+_PATCHES_CACHE: list[dict[str, Any]] | None = None
+_PATCH_NAMES: dict[int, str] = {}
+_PATCH_STARTS: list[tuple[int, str]] = []
+
+
+def fetch_patches() -> list[dict[str, Any]]:
+    global _PATCHES_CACHE, _PATCH_NAMES, _PATCH_STARTS
+    with _CONSTANT_LOCKS["patch"]:
+        data = _fetch_constant("patch", list)
+        if data is not _PATCHES_CACHE:
+            _PATCH_NAMES, _PATCH_STARTS = index_patches(data)
+            _PATCHES_CACHE = data
+        return data
 
 
 _HEROES_CACHE: dict[str, Any] | None = None
 _ITEMS_CACHE: dict[str, Any] | None = None
+_HERO_NAMES: dict[int, str] = {}
+_ITEM_NAMES: dict[int, str] = {}
 
 
 def fetch_heroes() -> dict[str, Any]:
-    global _HEROES_CACHE
-    if _HEROES_CACHE is not None:
-        return _HEROES_CACHE
-    url = "https://api.opendota.com/api/constants/heroes"
-    res = requests.get(url, timeout=30)
-    res.raise_for_status()
-    data = res.json()
-    if not isinstance(data, dict):
-        raise RuntimeError("Unexpected heroes constants payload")
-    _HEROES_CACHE = data
-    return _HEROES_CACHE
-
+    global _HEROES_CACHE, _HERO_NAMES
+    with _CONSTANT_LOCKS["heroes"]:
+        data = _fetch_constant("heroes", dict)
+        if data is not _HEROES_CACHE:
+            _HERO_NAMES = index_heroes(data)
+            _HEROES_CACHE = data
+        return data
 
 
 def fetch_items() -> dict[str, Any]:
-    global _ITEMS_CACHE
-    if _ITEMS_CACHE is not None:
-        return _ITEMS_CACHE
-    url = "https://api.opendota.com/api/constants/items"
-    res = requests.get(url, timeout=30)
-    res.raise_for_status()
-    data = res.json()
-    if not isinstance(data, dict):
-        raise RuntimeError("Unexpected items constants payload")
-    _ITEMS_CACHE = data
-    return _ITEMS_CACHE
+    global _ITEMS_CACHE, _ITEM_NAMES
+    with _CONSTANT_LOCKS["items"]:
+        data = _fetch_constant("items", dict)
+        if data is not _ITEMS_CACHE:
+            _ITEM_NAMES = index_items(data)
+            _ITEMS_CACHE = data
+        return data
+
+
+def submit_constants() -> Future[ConstantsIndex]:
+    """Start loading heroes/items/patches (cached); the future yields their lookup index.
+
+    The three payloads are loaded concurrently, so a cold cache costs one
+    round trip rather than three, and the caller can fetch the match in the
+    meantime. The future is completed by the last load to finish instead of
+    a thread waiting on the others. The id -> name maps are rebuilt only
+    when a payload actually changes, so this is cheap to call per video.
+    """
+    index: Future[ConstantsIndex] = Future()
+    loads = [_FETCH_POOL.submit(fetch) for fetch in (fetch_heroes, fetch_items, fetch_patches)]
+    remaining = len(loads)
+    lock = threading.Lock()
+
+    def load_done(_: Future[Any]) -> None:
+        nonlocal remaining
+        with lock:
+            remaining -= 1
+            if remaining:
+                return
+        error = next((err for err in (load.exception() for load in loads) if err is not None), None)
+        if error is not None:
+            index.set_exception(error)
+        else:
+            index.set_result(
+                ConstantsIndex(
+                    hero_names=_HERO_NAMES,
+                    item_names=_ITEM_NAMES,
+                    patch_names=_PATCH_NAMES,
+                    patch_starts=_PATCH_STARTS,
+                )
+            )
+
+    for load in loads:
+        load.add_done_callback(load_done)
+    return index
+
+
+def fetch_constants() -> ConstantsIndex:
+    """Load heroes/items/patches (cached) and return their lookup index."""
+    return submit_constants().result()
+
+
+@dataclass(frozen=True)
+class Resolution:
+    # recording epoch -> closest match id (None if no match window contains it)
+    assignments: dict[int, int | None]
+    # match id -> recording epochs, for matches claimed by more than one recording
+    conflicts: dict[int, list[int]]
+
+
+def resolve_many(
+    matches: list[RecentMatch],
+    recording_epochs: list[int],
+    *,
+    before_start_sec: int,
+    after_end_sec: int,
+) -> Resolution:
+    """Assign every recording to its closest match in a single sweep.
+
+    Matches are sorted by start once and the recordings are walked in time
+    order. A min-heap keyed on window end holds the matches whose window
+    [start - before, end + after] is open at the current recording, so each
+    match is pushed and popped at most once: O((n + m) log m) plus the scan
+    of the (small) set of overlapping windows per recording.
+    """
+    ordered = sorted(matches, key=lambda m: m.start_time)
+    active: list[tuple[int, int, RecentMatch]] = []
+    next_match = 0
+
+    assignments: dict[int, int | None] = {}
+    claimed: dict[int, list[int]] = {}
+
+    for epoch in sorted(set(recording_epochs)):
+        while next_match < len(ordered) and ordered[next_match].start_time - before_start_sec <= epoch:
+            m = ordered[next_match]
+            heapq.heappush(active, (m.start_time + m.duration + after_end_sec, next_match, m))
+            next_match += 1
+        while active and active[0][0] < epoch:
+            heapq.heappop(active)
+
+        best: tuple[int, int] | None = None
+        for _, order, m in active:
+            end = m.start_time + m.duration
+            dist = min(abs(epoch - m.start_time), abs(epoch - end))
+            if best is None or (dist, order) < best:
+                best = (dist, order)
+
+        match_id = ordered[best[1]].match_id if best is not None else None
+        assignments[epoch] = match_id
+        if match_id is not None:
+            claimed.setdefault(match_id, []).append(epoch)
+
+    conflicts = {match_id: epochs for match_id, epochs in claimed.items() if len(epochs) > 1}
+    return Resolution(assignments=assignments, conflicts=conflicts)
 
 
 def pick_match_for_recording_time(
@@ -118,16 +382,7 @@ def pick_match_for_recording_time(
     before_start_sec: int,
     after_end_sec: int,
 ) -> int | None:
-    candidates: list[tuple[int, int]] = []
-
-    for m in matches:
-        start = m.start_time
-        end = m.start_time + m.duration
-        within = (recording_epoch >= start - before_start_sec) and (recording_epoch <= end + after_end_sec)
-        if not within:
-            continue
-        dist = min(abs(recording_epoch - start), abs(recording_epoch - end))
-        candidates.append((dist, m.match_id))
-
-    candidates.sort(key=lambda t: t[0])
-    return candidates[0][1] if candidates else None
+    resolution = resolve_many(
+        matches, [recording_epoch], before_start_sec=before_start_sec, after_end_sec=after_end_sec
+    )
+    return resolution.assignments[recording_epoch]
@@ -0,0 +1,99 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+import json
+from pathlib import Path
+import threading
+import time
+from typing import Any
+
+from .sqlite_store import open_sqlite, shared
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS outbox (
+    id INTEGER PRIMARY KEY,
+    url TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at REAL NOT NULL,
+    last_error TEXT,
+    -- Set when the event was given up on; such events are kept for inspection but never sent again.
+    failed_at REAL
+);
+CREATE INDEX IF NOT EXISTS outbox_due ON outbox (next_attempt_at);
+"""
+
+
+@dataclass(frozen=True)
+class OutboxEvent:
+    id: int
+    url: str
+    payload: dict[str, Any]
+    attempts: int
+
+
+class Outbox:
+    """Webhook events waiting to be delivered, kept until the receiver accepts them.
+
+    Events are appended by the pipeline and removed by the sender once
+    posted; failed posts stay with a later ``next_attempt_at``, so nothing is
+    lost across webhook outages or restarts. Events the receiver rejects, or
+    that run out of attempts, are marked failed (with ``last_error``) and
+    left in the table.
+    """
+
+    def __init__(self, path: Path):
+        self._db = open_sqlite(path, _SCHEMA)
+        self._lock = threading.Lock()
+
+    def add(self, url: str, payload: dict[str, Any]) -> None:
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "INSERT INTO outbox (url, payload, created_at, next_attempt_at) VALUES (?, ?, ?, ?)",
+                (url, json.dumps(payload), now, now),
+            )
+
+    def due(self, limit: int, now: float | None = None) -> list[OutboxEvent]:
+        """Oldest events whose next attempt is due."""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT id, url, payload, attempts FROM outbox "
+                "WHERE next_attempt_at <= ? AND failed_at IS NULL ORDER BY id LIMIT ?",
+                (now if now is not None else time.time(), limit),
+            ).fetchall()
+        return [OutboxEvent(id=r[0], url=r[1], payload=json.loads(r[2]), attempts=r[3]) for r in rows]
+
+    def next_due_at(self) -> float | None:
+        with self._lock:
+            row = self._db.execute("SELECT MIN(next_attempt_at) FROM outbox WHERE failed_at IS NULL").fetchone()
+        return row[0] if row else None
+
+    def pending(self) -> int:
+        with self._lock:
+            return int(self._db.execute("SELECT COUNT(*) FROM outbox WHERE failed_at IS NULL").fetchone()[0])
+
+    def delivered(self, events: list[OutboxEvent]) -> None:
+        with self._lock:
+            self._db.executemany("DELETE FROM outbox WHERE id = ?", [(e.id,) for e in events])
+
+    def retry_later(self, events: list[OutboxEvent], error: str, delay_sec: float) -> None:
+        with self._lock:
+            self._db.executemany(
+                "UPDATE outbox SET attempts = attempts + 1, next_attempt_at = ?, last_error = ? WHERE id = ?",
+                [(time.time() + delay_sec, error, e.id) for e in events],
+            )
+
+    def give_up(self, events: list[OutboxEvent], error: str) -> None:
+        with self._lock:
+            self._db.executemany(
+                "UPDATE outbox SET attempts = attempts + 1, failed_at = ?, last_error = ? WHERE id = ?",
+                [(time.time(), error, e.id) for e in events],
+            )
+
+
+def open_outbox(data_dir: Path) -> Outbox:
+    """Shared outbox at ``<data_dir>/outbox.sqlite3``."""
+    return shared(Outbox, data_dir / "outbox.sqlite3")
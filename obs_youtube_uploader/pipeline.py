@@ -0,0 +1,188 @@
+from __future__ import annotations
+
+from collections import OrderedDict, deque
+import heapq
+import itertools
+import queue
+import threading
+import time
+from typing import Any, Callable, Hashable
+
+
+_STOP = object()
+# Lane key for ``_STOP``; no ``fair_key`` can return it, so the sentinel never
+# meets a lane's ``priority`` function. It is served only once the item lanes
+# are empty, so workers still finish the queued work first.
+_STOP_LANE = object()
+
+
+class _Lane:
+    """Items of one key: insertion order, or lowest ``priority`` first."""
+
+    def __init__(self, priority: Callable[[Any], Any] | None):
+        self._priority = priority
+        self._fifo: deque[Any] = deque()
+        self._heap: list[tuple[Any, int, Any]] = []
+        self._seq = itertools.count()
+
+    def __len__(self) -> int:
+        return len(self._heap) if self._priority else len(self._fifo)
+
+    def push(self, item: Any) -> None:
+        if self._priority is None:
+            self._fifo.append(item)
+        else:
+            heapq.heappush(self._heap, (self._priority(item), next(self._seq), item))
+
+    def pop(self) -> Any:
+        if self._priority is None:
+            return self._fifo.popleft()
+        return heapq.heappop(self._heap)[2]
+
+
+class _FairQueue:
+    """Bounded queue that hands items out round-robin across keys.
+
+    Within a key, items come out in insertion order, or lowest ``priority``
+    first if given; one busy key can't starve the others. Implements the
+    part of ``queue.Queue`` that ``Stage`` uses.
+    """
+
+    def __init__(
+        self, key: Callable[[Any], Hashable], maxsize: int, priority: Callable[[Any], Any] | None = None
+    ):
+        self._key = key
+        self._priority = priority
+        self._maxsize = maxsize
+        self._lanes: OrderedDict[Hashable, _Lane] = OrderedDict()
+        self._size = 0
+        self._cond = threading.Condition()
+
+    def put(self, item: Any, block: bool = True) -> None:
+        with self._cond:
+            while self._maxsize > 0 and self._size >= self._maxsize:
+                if not block:
+                    raise queue.Full
+                self._cond.wait()
+            if item is _STOP:
+                lane = self._lanes.setdefault(_STOP_LANE, _Lane(None))
+            else:
+                lane = self._lanes.setdefault(self._key(item), _Lane(self._priority))
+            lane.push(item)
+            self._size += 1
+            self._cond.notify_all()
+
+    def put_nowait(self, item: Any) -> None:
+        self.put(item, block=False)
+
+    def get(self) -> Any:
+        with self._cond:
+            while self._size == 0:
+                self._cond.wait()
+            key = next((k for k in self._lanes if k is not _STOP_LANE), _STOP_LANE)
+            lane = self._lanes[key]
+            item = lane.pop()
+            if lane:
+                self._lanes.move_to_end(key)
+            else:
+                del self._lanes[key]
+            self._size -= 1
+            self._cond.notify_all()
+            return item
+
+    def task_done(self) -> None:
+        pass
+
+
+class Stage:
+    """A bounded work queue drained by a fixed pool of worker threads.
+
+    The handler's return value (if not None) is passed on to ``downstream``.
+    ``put`` blocks once the queue is full, so a slow stage applies
+    backpressure to the one feeding it instead of buffering without limit.
+    With ``fair_key``, queued items are taken round-robin across the keys it
+    returns (e.g. one per profile) instead of first-in first-out, and with
+    ``priority`` lowest-first within a key.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        handler: Callable[[Any], Any],
+        *,
+        workers: int,
+        maxsize: int,
+        downstream: Stage | None = None,
+        fair_key: Callable[[Any], Hashable] | None = None,
+        priority: Callable[[Any], Any] | None = None,
+    ):
+        self.name = name
+        self._handler = handler
+        self._workers = max(1, workers)
+        self._q: queue.Queue[Any] | _FairQueue
+        if fair_key is None and priority is None:
+            self._q = queue.Queue(maxsize=max(0, maxsize))
+        else:
+            self._q = _FairQueue(fair_key or (lambda item: None), max(0, maxsize), priority)
+        self._downstream = downstream
+        self._threads: list[threading.Thread] = []
+        # Items to put() later: (due monotonic time, seq, item).
+        self._later: list[tuple[float, int, Any]] = []
+        self._later_seq = itertools.count()
+        self._later_cond = threading.Condition()
+        self._later_thread: threading.Thread | None = None
+
+    def put(self, item: Any) -> None:
+        self._q.put(item)
+
+    def put_later(self, item: Any, delay_sec: float) -> None:
+        """Queue ``item`` after ``delay_sec`` seconds (one timer thread per stage)."""
+        with self._later_cond:
+            heapq.heappush(self._later, (time.monotonic() + max(0.0, delay_sec), next(self._later_seq), item))
+            if self._later_thread is None:
+                self._later_thread = threading.Thread(target=self._run_later, name=f"{self.name}-later", daemon=True)
+                self._later_thread.start()
+            self._later_cond.notify()
+
+    def _run_later(self) -> None:
+        while True:
+            with self._later_cond:
+                while not self._later or self._later[0][0] > time.monotonic():
+                    timeout = self._later[0][0] - time.monotonic() if self._later else None
+                    self._later_cond.wait(timeout=timeout)
+                _, _, item = heapq.heappop(self._later)
+            self.put(item)
+
+    def start(self) -> None:
+        for i in range(self._workers):
+            t = threading.Thread(target=self._run, name=f"{self.name}-{i}", daemon=True)
+            t.start()
+            self._threads.append(t)
+
+    def stop(self, timeout: float = 10.0) -> None:
+        """Ask workers to exit once idle; waits at most ``timeout`` seconds overall."""
+        for _ in self._threads:
+            try:
+                self._q.put_nowait(_STOP)
+            except queue.Full:
+                break
+        deadline = time.monotonic() + timeout
+        for t in self._threads:
+            t.join(timeout=max(0.0, deadline - time.monotonic()))
+        self._threads.clear()
+
+    def _run(self) -> None:
+        while True:
+            item = self._q.get()
+            try:
+                if item is _STOP:
+                    return
+                try:
+                    result = self._handler(item)
+                except Exception as err:
+                    print(f"[{self.name}:error] {err}")
+                    continue
+                if result is not None and self._downstream is not None:
+                    self._downstream.put(result)
+            finally:
+                self._q.task_done()
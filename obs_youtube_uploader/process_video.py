@@ -1,179 +1,47 @@
 from __future__ import annotations
 
-from dataclasses import dataclass
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from dataclasses import replace
 from datetime import datetime, timezone
 import re
 from pathlib import Path
+import time
 
 from zoneinfo import ZoneInfo
 
 from .config import Config
-from .description import build_match_description
-from .notify import send_finished_notification
-from .opendota import (
-    fetch_heroes,
-    fetch_items,
-    fetch_match,
-    fetch_patches,
-    fetch_player_matches,
-    fetch_recent_matches,
-    pick_match_for_recording_time,
-)
-from .youtube_uploader import upload_to_youtube
-
-
-def _hero_name(heroes: dict, hero_id: int) -> str:
-    for h in heroes.values():
-        if int(h.get("id", -1)) == hero_id:
-            return str(h.get("localized_name") or f"Hero {hero_id}")
-    return f"Hero {hero_id}"
-
-
-def _item_name(items: dict, item_id: int) -> str:
-    for i in items.values():
-        if int(i.get("id", -1)) == item_id:
-            return str(i.get("dname") or f"Item {item_id}")
-    return f"Item {item_id}"
-
-
-def _player_from_match(match: dict, account_id: int) -> dict | None:
-    for p in match.get("players", []) or []:
-        if p.get("account_id") == account_id:
-            return p
-    return None
-
-
-def _patch_name_for_match(match: dict, patches: list[dict]) -> str | None:
-    patch_id = match.get("patch")
-    if patch_id is None:
-        return None
-
-    try:
-        pid = int(patch_id)
-    except Exception:
+from .constants import ConstantsIndex
+from .description import build_match_context
+from .fingerprint import ensure_fingerprint, find_duplicate, hash_in_background
+from .highlights import Highlight, find_highlights, game_time_offset
+from .jobs import Job, JobStore
+from .match_model import Match
+from .match_index import get_match_index
+from .notify import send_finished_notification, send_stage_event
+from .opendota import fetch_constants, fetch_match, submit_constants
+from .quota import THUMBNAIL_QUOTA_COST, UPLOAD_QUOTA_COST, QuotaExhausted, open_quota_ledger
+from .remux import cut_clip, discard, grab_frame, needs_remux, probe, remux, remuxed_path
+from .templates import load_templates
+from .thumbnail import submit_render
+from .timeline import build_chapters
+from .youtube_uploader import is_quota_error, set_thumbnail, upload_to_youtube
+
+
+def _patch_name_for_match(match: Match, constants: ConstantsIndex) -> str | None:
+    if match.patch is not None:
+        name = constants.patch_name(match.patch)
+        if name:
+            return name
+
+    # Fresh matches may not carry a patch id yet; fall back to release dates.
+    if not match.start_time:
         return None
+    return constants.patch_name_at(match.start_time)
 
-    for p in patches:
-        if int(p.get("id", -1)) == pid:
-            return str(p.get("name"))
-
-    return None
-
-
-def _build_seo_title(hero: str, patch: str | None, result: str, duration_min: int, match_id: int) -> str:
-    parts: list[str] = []
-    parts.append(f"{hero} Gameplay")
-    if patch:
-        parts.append(f"Patch {patch}")
-    parts.append(result)
-    parts.append(f"{duration_min}min")
-    parts.append("Dota 2")
-    parts.append(f"Match {match_id}")
-    return " | ".join(parts)
-
-
-def _extract_item_names(player: dict, items: dict) -> list[str]:
-    ids = [
-        player.get("item_0"),
-        player.get("item_1"),
-        player.get("item_2"),
-        player.get("item_3"),
-        player.get("item_4"),
-        player.get("item_5"),
-        player.get("item_neutral"),
-    ]
-
-    out: list[str] = []
-    for x in ids:
-        if not x:
-            continue
-        try:
-            iid = int(x)
-        except Exception:
-            continue
-        if iid <= 0:
-            continue
-        out.append(_item_name(items, iid))
-
-    # Dedup while preserving order
-    dedup: list[str] = []
-    for n in out:
-        if n not in dedup:
-            dedup.append(n)
-    return dedup
-
-
-def _build_thumbnail_prompt(
-    *,
-    hero: str,
-    patch: str | None,
-    result: str,
-    duration_min: int,
-    score_text: str,
-    kda_text: str | None,
-    items_text: str | None,
-    match_id: int,
-) -> str:
-    patch_part = f"Patch {patch}" if patch else "Current Patch"
-
-    lines: list[str] = []
-    lines.append("Create a YouTube thumbnail for a Dota 2 match video.")
-    lines.append(f"Hero: {hero}.")
-    lines.append(f"Match result: {result}.")
-    lines.append(f"Match length: {duration_min} minutes.")
-    lines.append(f"Score: {score_text}.")
-    if kda_text:
-        lines.append(f"KDA: {kda_text}.")
-    if items_text:
-        lines.append(f"Key items: {items_text}.")
-    lines.append(f"{patch_part}.")
-    lines.append(f"Match ID: {match_id}.")
-    lines.append(
-        "Style: high-contrast esports thumbnail, sharp hero portrait, dynamic action background, "
-        "bold readable text, clean composition, 16:9, 1280x720."
-    )
-    lines.append(
-        "Text overlay (few words): '" + hero.upper() + " BUILD' and '" + result.upper() + "' and '" + patch_part.upper() + "'."
-    )
-    lines.append("Avoid: small text, clutter, watermarks, blurry faces.")
-
-    return " ".join(lines)
-
-
-def _build_tags(hero: str, patch: str | None, item_names: list[str]) -> list[str]:
-    base = [
-        "dota 2",
-        "dota2",
-        f"{hero}",
-        f"{hero} gameplay",
-        "dota 2 gameplay",
-        "dota 2 ranked",
-        "dota 2 highlights",
-        "dota 2 build",
-        "dota 2 items",
-        "dota patch",
-        "opendota",
-    ]
-
-    if patch:
-        base.extend([f"dota 2 patch {patch}", f"patch {patch}"])
-
-    # Add up to 10 item tags
-    for item in item_names[:10]:
-        base.append(item)
-        base.append(f"{hero} {item}")
-
-    # Dedup and cap at 450-ish chars is handled by YouTube, but keep reasonable.
-    dedup: list[str] = []
-    for t in base:
-        tt = t.strip()
-        if not tt:
-            continue
-        if tt.lower() in (x.lower() for x in dedup):
-            continue
-        dedup.append(tt)
 
-    return dedup[:35]
+def _build_highlight_title(hero: str, label: str, match_id: int) -> str:
+    return " | ".join([f"{hero} {label}", "Dota 2 Highlight", f"Match {match_id}"])
 
 
 _FILENAME_RE = re.compile(
@@ -202,155 +70,483 @@ def _parse_obs_filename_time_to_utc(path: Path, tz_name: str) -> datetime:
 def _resolve_match_id(config: Config, recording_start_utc: datetime) -> int:
     recording_epoch = int(recording_start_utc.timestamp())
 
-    window = {
-        "before_start_sec": config.match_time_before_sec,
-        "after_end_sec": config.match_time_after_sec,
-    }
-
-    recent = fetch_recent_matches(config.opendota_player_id)
-    match_id = pick_match_for_recording_time(recent, recording_epoch, **window)
-    if match_id:
-        return match_id
-
-    now_epoch = int(datetime.now(timezone.utc).timestamp())
-    days_back = int((now_epoch - recording_epoch) / (24 * 60 * 60)) + 2
-    days_back = max(1, min(days_back, 3650))
-
-    older = fetch_player_matches(config.opendota_player_id, limit=200, date_days=days_back)
-    match_id = pick_match_for_recording_time(older, recording_epoch, **window)
+    index = get_match_index(config.data_dir, config.opendota_player_id)
+    match_id = index.find(
+        recording_epoch,
+        before_start_sec=config.match_time_before_sec,
+        after_end_sec=config.match_time_after_sec,
+    )
     if match_id:
         return match_id
 
+    last_sync = index.last_sync
+    synced = datetime.fromtimestamp(last_sync, timezone.utc).isoformat() if last_sync else "never"
     raise RuntimeError(
         f"No match found near recording time ({recording_start_utc.isoformat()}Z). "
         f"Window start-{config.match_time_before_sec}s/end+{config.match_time_after_sec}s. "
-        f"Tried recentMatches and players/matches?date={days_back}."
+        f"Searched local match history (last synced {synced})."
+    )
+
+
+def resolve_match_ids(config: Config, video_paths: list[Path]) -> dict[Path, int | None]:
+    """Resolve many recordings at once and report recordings that claim the same match.
+
+    Files whose names can't be parsed map to None.
+    """
+    epochs: dict[Path, int] = {}
+    for path in video_paths:
+        try:
+            epochs[path] = int(_parse_obs_filename_time_to_utc(path, config.recording_tz).timestamp())
+        except Exception as err:
+            print(f"[resolve:skip] {path.name}: {err}")
+
+    index = get_match_index(config.data_dir, config.opendota_player_id)
+    resolution = index.resolve_many(
+        list(epochs.values()),
+        before_start_sec=config.match_time_before_sec,
+        after_end_sec=config.match_time_after_sec,
     )
 
+    by_epoch: dict[int, list[Path]] = {}
+    for path, epoch in epochs.items():
+        by_epoch.setdefault(epoch, []).append(path)
+    for match_id, conflict_epochs in resolution.conflicts.items():
+        names = ", ".join(p.name for e in conflict_epochs for p in by_epoch[e])
+        print(f"[resolve:conflict] match={match_id} claimed by: {names}")
+
+    return {path: resolution.assignments.get(epochs[path]) if path in epochs else None for path in video_paths}
+
+
+def _format_game_time(seconds: int) -> str:
+    sign = "-" if seconds < 0 else ""
+    return f"{sign}{abs(seconds) // 60}:{abs(seconds) % 60:02d}"
+
 
 def _description_path(video_path: Path) -> Path:
     return video_path.with_suffix(".txt")
 
 
-def process_video(config: Config, video_path: Path) -> None:
-    started_at = datetime.now(timezone.utc)
+def _thumbnail_path(video_path: Path) -> Path:
+    return video_path.with_suffix(".jpg")
+
+
+def _make_thumbnail(
+    config: Config,
+    video_path: Path,
+    match: Match,
+    *,
+    offset_sec: float,
+    length_sec: float,
+    hero: str,
+    result: str,
+    patch: str | None,
+) -> Path:
+    """Render the thumbnail from a frame in the middle of the biggest teamfight (or of the match)."""
+    if match.teamfights:
+        biggest = max(match.teamfights, key=lambda f: f.deaths)
+        game_time = (biggest.start + biggest.end) / 2
+    else:
+        game_time = match.duration / 2
+    at = min(offset_sec + game_time, length_sec * 0.95)
+
+    thumbnail_path = _thumbnail_path(video_path)
+    frame_path = thumbnail_path.with_suffix(".frame.jpg")
+    started = time.monotonic()
+    try:
+        grab_frame(config, video_path, frame_path, at=at)
+        submit_render(
+            config.thumbnail_workers,
+            frame_path,
+            thumbnail_path,
+            hero=hero,
+            result=result,
+            patch=patch,
+            font_path=config.thumbnail_font,
+        ).result()
+    finally:
+        frame_path.unlink(missing_ok=True)
+    print(f"[thumbnail:done] {thumbnail_path.name} frame={at:.0f}s ({time.monotonic() - started:.1f}s)")
+    return thumbnail_path
+
+
+def _recording_length(config: Config, video_path: Path, match: Match, offset_sec: float) -> float:
+    """Length of the recording in seconds.
+
+    Probed when remuxing or thumbnails need ffprobe anyway; otherwise (or
+    if probing fails) the end of the game is used as an upper bound.
+    """
+    if config.remux_enabled or config.thumbnails_enabled:
+        try:
+            return float(probe(config, video_path)["format"]["duration"])
+        except Exception as err:
+            print(f"[probe:error] {video_path.name}: {err}")
+    return offset_sec + match.duration
+
+
+def _notify_error(config: Config, jobs: JobStore, job: Job, err: Exception) -> None:
+    jobs.fail(job, str(err))
+    try:
+        send_finished_notification(
+            config,
+            status="error",
+            started_at=job.created_at,
+            finished_at=datetime.now(timezone.utc),
+            video_path=str(job.path),
+            description_path=str(job.description_path) if job.description_path else None,
+            match_id=job.match_id,
+            youtube_video_id=job.video_id,
+            error=str(err),
+        )
+    except Exception as notify_err:
+        print(f"[notify:error] {notify_err}")
+
+    print(f"[process:error] {job.path} {err}")
+
+
+def prepare_video(config: Config, jobs: JobStore, job: Job, *, match_id: int | None = None) -> Job | None:
+    """Resolve the match for a recording and write its `.txt` description.
+
+    ``match_id`` skips the lookup when it was already resolved in a batch.
+    Jobs that already got this far are returned unchanged. Returns None
+    (after recording the error and sending the error notification) if
+    anything fails.
+    """
+    if config.dedupe_uploads and job.content_hash is None and not job.reached("uploaded"):
+        hash_in_background(config, job)
+    if job.reached("described"):
+        return job
 
-    match_id: int | None = None
-    youtube_video_id: str | None = None
-    description_path: Path | None = None
+    video_path = job.path
 
     try:
+        # Recorded whether or not deduplication is on, so later copies of this recording can be recognized.
+        ensure_fingerprint(jobs, job)
         recording_start_utc = _parse_obs_filename_time_to_utc(video_path, config.recording_tz)
-        match_id = _resolve_match_id(config, recording_start_utc)
+        # Loads while the match is resolved and fetched, so the metadata costs the slowest lookup, not their sum.
+        constants_load = submit_constants()
+        if job.match_id is None:
+            if match_id is None:
+                match_id = _resolve_match_id(config, recording_start_utc)
+            jobs.advance(job, "resolved", match_id=match_id)
+            send_stage_event(config, "resolved", video_path=str(video_path), match_id=match_id)
+        match_id = job.match_id
 
         match = fetch_match(match_id)
-        heroes = fetch_heroes()
-        items = fetch_items()
-        patches = fetch_patches()
+        constants = constants_load.result()
 
-        description = build_match_description(
+        offset = game_time_offset(match, recording_start_utc, config.highlight_offset_sec)
+        length = _recording_length(config, video_path, match, offset)
+
+        chapters = None
+        if config.chapters_enabled:
+            player = match.player(config.opendota_player_id)
+            chapters = build_chapters(match, player, offset, length_sec=length, min_gap_sec=config.chapter_min_gap_sec)
+
+        patch_name = _patch_name_for_match(match, constants)
+        context = build_match_context(
             recording_start_utc=recording_start_utc,
             player_account_id=config.opendota_player_id,
             match=match,
-            heroes=heroes,
-            items=items,
+            constants=constants,
+            patch=patch_name,
+            chapters=chapters,
         )
 
-        player = _player_from_match(match, config.opendota_player_id)
-        hero = _hero_name(heroes, int(player.get("hero_id", 0))) if player else "Dota 2"
-        patch_name = _patch_name_for_match(match, patches)
-        player_is_radiant = bool(player) and int(player.get("player_slot", 0) or 0) < 128
-        radiant_win = bool(match.get("radiant_win"))
-        result = "Win" if (radiant_win if player_is_radiant else not radiant_win) else "Loss"
-        duration_min = max(1, int(int(match.get("duration", 0)) / 60))
-
-        item_names = _extract_item_names(player, items) if player else []
-
-        score_text = f"Radiant {int(match.get('radiant_score', 0))} - {int(match.get('dire_score', 0))} Dire"
-        kda_text = None
-        if player:
-            kda_text = f"{int(player.get('kills', 0))}/{int(player.get('deaths', 0))}/{int(player.get('assists', 0))}"
-
-        items_text = ", ".join(item_names[:8]) if item_names else None
-
-        title = _build_seo_title(hero, patch_name, result, duration_min, int(match.get("match_id") or match_id))
-
-        # SEO: add extra sections to description
-        extra_lines: list[str] = []
-        extra_lines.append("")
-        extra_lines.append("Video")
-        extra_lines.append(f"Hero: {hero}")
-        if patch_name:
-            extra_lines.append(f"Patch: {patch_name}")
-        if item_names:
-            extra_lines.append("Items: " + ", ".join(item_names[:12]))
-        extra_lines.append(f"Match: https://www.opendota.com/matches/{match_id}")
-        extra_lines.append("\n#dota2 #dota #opendota")
-
-        match_id_for_prompt = int(match.get("match_id") or match_id)
-        thumbnail_prompt = _build_thumbnail_prompt(
-            hero=hero,
-            patch=patch_name,
-            result=result,
-            duration_min=duration_min,
-            score_text=score_text,
-            kda_text=kda_text,
-            items_text=items_text,
-            match_id=match_id_for_prompt,
+        thumbnail_path = None
+        if config.thumbnails_enabled:
+            try:
+                thumbnail_path = _make_thumbnail(
+                    config,
+                    video_path,
+                    match,
+                    offset_sec=offset,
+                    length_sec=length,
+                    hero=context.hero,
+                    result=context.result,
+                    patch=patch_name,
+                )
+            except Exception as err:
+                print(f"[thumbnail:error] {video_path.name}: {err}")
+
+        # The prompt for making a thumbnail by hand isn't needed once one was rendered.
+        if thumbnail_path is not None:
+            context = replace(context, thumbnail_prompt=None)
+
+        templates = load_templates(config.title_template, config.description_template, config.tags_template)
+        description_path = _description_path(video_path)
+        description_path.write_text(templates.description(context), encoding="utf-8")
+
+        jobs.advance(
+            job, "described", title=templates.title(context), tags=templates.tags(context), description_path=description_path
         )
+        print(f"[describe:done] {video_path.name} match={match_id}")
+        return job
 
-        extra_lines.append("")
-        extra_lines.append("Thumbnail Prompt")
-        extra_lines.append(thumbnail_prompt)
+    except Exception as err:
+        _notify_error(config, jobs, job, err)
+        return None
 
-        full_description = description + "\n".join(extra_lines) + "\n"
 
-        description_path = _description_path(video_path)
-        description_path.write_text(full_description, encoding="utf-8")
+def remux_video(config: Config, jobs: JobStore, job: Job) -> Job | None:
+    """Check the recording's container and, if needed, remux it to a faststart MP4 for upload.
 
-        seo_tags = _build_tags(hero, patch_name, item_names)
+    Returns None (after recording the error and sending the error
+    notification) if the container is broken, so no upload is attempted.
+    If remuxing itself fails the original file is uploaded.
+    """
+    if job.reached("uploaded"):
+        return job
+    if job.upload_path is not None:
+        if job.upload_path.exists():
+            return job
+        jobs.set_upload_path(job, None)
 
-        if not config.dry_run:
-            print(f"[upload:start] {video_path.name} -> YouTube")
-            youtube_video_id = upload_to_youtube(
-                config,
-                file_path=str(video_path),
-                title=title,
-                description=full_description,
-                tags=seo_tags,
-            )
-            print(f"[upload:done] videoId={youtube_video_id}")
+    try:
+        probe(config, job.path)
+    except Exception as err:
+        _notify_error(config, jobs, job, err)
+        return None
+
+    # Keep going with the original if an upload of it is already under way.
+    if job.upload_uri is not None or not needs_remux(job.path):
+        return job
+    # upload_video skips copies of uploaded recordings; don't remux those either.
+    if config.dedupe_uploads and find_duplicate(jobs, job) is not None:
+        return job
+
+    target = remuxed_path(config, job.id, job.path)
+    started = time.monotonic()
+    try:
+        remux(config, job.path, target)
+    except Exception as err:
+        print(f"[remux:error] {job.path.name}: {err}; uploading the original")
+        return job
+
+    jobs.set_upload_path(job, target)
+    print(f"[remux:done] {job.path.name} -> {target.name} ({time.monotonic() - started:.1f}s)")
+    return job
+
+
+def extract_highlights(config: Config, jobs: JobStore, job: Job) -> list[Job]:
+    """Cut clips of the player's multi-kills and teamfights out of a described recording.
+
+    Game time is mapped to video time from the filename timestamp and the
+    match start. Clips are stream copies (no re-encode) cut in parallel,
+    and each one becomes its own described job, returned ready to upload.
+    Clips are cut once per recording; failures are logged and don't affect
+    the recording's own upload.
+    """
+    if job.parent_id is not None or job.match_id is None or jobs.clips_of(job):
+        return []
+
+    video_path = job.path
+    try:
+        match = fetch_match(job.match_id)
+        found = find_highlights(match, config.opendota_player_id, min_kills=config.highlight_min_kills)
+        recording_start_utc = _parse_obs_filename_time_to_utc(video_path, config.recording_tz)
+        offset = game_time_offset(match, recording_start_utc, config.highlight_offset_sec)
+        length = float(probe(config, video_path)["format"]["duration"])
+
+        windows: list[tuple[Highlight, float, float]] = []
+        for h in found:
+            start, end = max(0.0, h.start + offset), min(length, h.end + offset)
+            if end - start >= 5:
+                windows.append((h, start, end))
+        if not windows:
+            print(f"[highlights] {video_path.name}: nothing to clip")
+            return []
+
+        constants = fetch_constants()
+        context = build_match_context(
+            recording_start_utc=recording_start_utc,
+            player_account_id=config.opendota_player_id,
+            match=match,
+            constants=constants,
+            patch=_patch_name_for_match(match, constants),
+        )
+        # The clip tags are the recording's, without the per-item ones.
+        templates = load_templates(config.title_template, config.description_template, config.tags_template)
+        tags = templates.tags(replace(context, item_names=()))
+        hero = context.hero
+
+        config.highlights_dir.mkdir(parents=True, exist_ok=True)
+        targets = [
+            config.highlights_dir / f"{job.id}-{video_path.stem}-hl{i:02d}.mp4" for i in range(1, len(windows) + 1)
+        ]
+        started = time.monotonic()
+        with ThreadPoolExecutor(max_workers=max(1, config.highlight_workers), thread_name_prefix="highlight") as pool:
+            cuts = [
+                pool.submit(cut_clip, config, video_path, target, start=start, duration=end - start)
+                for (_, start, end), target in zip(windows, targets)
+            ]
+    except Exception as err:
+        print(f"[highlights:error] {video_path.name}: {err}")
+        return []
+
+    clips: list[Job] = []
+    for (h, start, end), target, cut in zip(windows, targets, cuts):
+        try:
+            cut.result()
+        except Exception as err:
+            print(f"[highlights:error] {err}")
+            continue
+        description_path = target.with_suffix(".txt")
+        description_path.write_text(
+            f"{hero} {h.label} at {_format_game_time(h.at)} game time.\n\n"
+            f"Match: https://www.opendota.com/matches/{job.match_id}\n",
+            encoding="utf-8",
+        )
+        clip = jobs.job_for(target, profile=job.profile, parent_id=job.id)
+        jobs.advance(
+            clip,
+            "described",
+            match_id=job.match_id,
+            title=_build_highlight_title(hero, h.label, job.match_id),
+            tags=tags,
+            description_path=description_path,
+        )
+        clips.append(clip)
+    print(f"[highlights:done] {video_path.name}: {len(clips)} clip(s) ({time.monotonic() - started:.1f}s)")
+    return clips
+
+
+def _upload_thumbnail(config: Config, video_id: str, thumbnail_path: Path) -> None:
+    """Set the rendered thumbnail; failures are logged, the video keeps YouTube's own thumbnail."""
+    try:
+        ledger = open_quota_ledger(config.data_dir)
+        ledger.charge(config.youtube_client_id, THUMBNAIL_QUOTA_COST, config.youtube_daily_quota)
+        set_thumbnail(config, video_id=video_id, image_path=str(thumbnail_path))
+    except Exception as err:
+        print(f"[thumbnail:error] videoId={video_id}: {err}")
+        return
+    print(f"[thumbnail:set] videoId={video_id}")
+
+
+def _skip_duplicate(config: Config, jobs: JobStore, job: Job, duplicate: Job) -> None:
+    """Finish ``job`` with the video already uploaded from the same recording."""
+    upload_path = job.upload_path
+    jobs.advance(job, "uploaded", video_id=duplicate.video_id, upload_uri=None, upload_offset=0, upload_path=None)
+    if upload_path is not None:
+        discard(config, upload_path)
+    print(
+        f"[dedupe] {job.path.name} is a copy of {duplicate.path.name} "
+        f"(videoId={duplicate.video_id} match={duplicate.match_id}); not uploading again"
+    )
+    try:
+        send_finished_notification(
+            config,
+            status="duplicate",
+            started_at=job.created_at,
+            finished_at=datetime.now(timezone.utc),
+            video_path=str(job.path),
+            description_path=str(job.description_path) if job.description_path else None,
+            match_id=duplicate.match_id,
+            youtube_video_id=duplicate.video_id,
+        )
+        jobs.advance(job, "notified")
+    except Exception as notify_err:
+        print(f"[notify:error] {notify_err}")
+    print(f"[done] {job.path}")
+
+
+def _upload(config: Config, jobs: JobStore, job: Job, description: str) -> None:
+    """Start (or resume) the YouTube upload of ``job`` and record the video id."""
+    video_path = job.path
+    ledger = open_quota_ledger(config.data_dir)
+
+    def charge_upload() -> None:
+        ledger.charge(config.youtube_client_id, UPLOAD_QUOTA_COST, config.youtube_daily_quota)
+
+    # Resuming a session is free; a new one (also replacing an expired session) costs an upload.
+    if job.upload_uri is None:
+        charge_upload()
+
+    upload_path = job.upload_path or video_path
+    print(f"[upload:start] {upload_path.name} -> YouTube")
+    send_stage_event(config, "uploading", video_path=str(video_path), match_id=job.match_id)
+    try:
+        youtube_video_id = upload_to_youtube(
+            config,
+            file_path=str(upload_path),
+            title=job.title,
+            description=description,
+            tags=job.tags,
+            resume_uri=job.upload_uri,
+            on_session=lambda uri, offset: jobs.save_upload_session(job, uri, offset),
+            on_new_session=charge_upload,
+        )
+    except Exception as err:
+        if not is_quota_error(err):
+            raise
+        retry_at = ledger.exhaust(config.youtube_client_id, config.youtube_daily_quota)
+        raise QuotaExhausted(f"YouTube rejected the upload: {err}", retry_at) from err
+    jobs.advance(job, "uploaded", video_id=youtube_video_id, upload_uri=None, upload_offset=0, upload_path=None)
+    if upload_path != video_path:
+        discard(config, upload_path)
+    print(f"[upload:done] videoId={youtube_video_id}")
+    if config.thumbnails_enabled and _thumbnail_path(video_path).exists():
+        _upload_thumbnail(config, youtube_video_id, _thumbnail_path(video_path))
+    send_stage_event(
+        config, "uploaded", video_path=str(video_path), match_id=job.match_id, youtube_video_id=youtube_video_id
+    )
+
+
+def upload_video(config: Config, jobs: JobStore, job: Job) -> None:
+    """Upload a described job and send the success notification.
+
+    Each step is recorded, so a job that was uploaded but not notified
+    only retries the notification.
+
+    Starting a new upload session is charged against the day's YouTube
+    quota. Raises ``QuotaExhausted`` (without failing the job) when the
+    quota is used up, so the caller can retry after ``retry_at``.
+
+    With deduplication on, the recording's fingerprint is claimed for the
+    whole upload: a copy handled by another upload worker waits, then
+    finishes as a duplicate of this one.
+    """
+    video_path = job.path
+
+    try:
+        if not job.reached("uploaded"):
+            if config.dry_run:
+                print(f"[done] {video_path} (dry run)")
+                return
+
+            if job.description_path is None or job.title is None:
+                raise RuntimeError(f"Job {job.id} has no description to upload")
+            description = job.description_path.read_text(encoding="utf-8")
+
+            if config.dedupe_uploads:
+                ensure_fingerprint(jobs, job)
+            with jobs.upload_claim(job) if config.dedupe_uploads else nullcontext():
+                if config.dedupe_uploads and job.upload_uri is None:
+                    duplicate = find_duplicate(jobs, job)
+                    if duplicate is not None:
+                        _skip_duplicate(config, jobs, job, duplicate)
+                        return
+                _upload(config, jobs, job, description)
 
         try:
             send_finished_notification(
                 config,
                 status="success",
-                started_at=started_at,
+                started_at=job.created_at,
                 finished_at=datetime.now(timezone.utc),
                 video_path=str(video_path),
-                description_path=str(description_path) if description_path else None,
-                match_id=match_id,
-                youtube_video_id=youtube_video_id,
+                description_path=str(job.description_path) if job.description_path else None,
+                match_id=job.match_id,
+                youtube_video_id=job.video_id,
             )
+            jobs.advance(job, "notified")
         except Exception as notify_err:
             print(f"[notify:error] {notify_err}")
 
         print(f"[done] {video_path}")
 
+    except QuotaExhausted as err:
+        jobs.fail(job, f"deferred: {err}")
+        raise
     except Exception as err:
-        try:
-            send_finished_notification(
-                config,
-                status="error",
-                started_at=started_at,
-                finished_at=datetime.now(timezone.utc),
-                video_path=str(video_path),
-                description_path=str(description_path) if description_path else None,
-                match_id=match_id,
-                youtube_video_id=youtube_video_id,
-                error=str(err),
-            )
-        except Exception as notify_err:
-            print(f"[notify:error] {notify_err}")
+        _notify_error(config, jobs, job, err)
 
-        print(f"[process:error] {video_path} {err}")
@@ -0,0 +1,112 @@
+from __future__ import annotations
+
+from datetime import datetime, time as dt_time, timedelta, timezone
+from pathlib import Path
+import threading
+import time
+
+from zoneinfo import ZoneInfo
+
+from .sqlite_store import open_sqlite, shared
+
+
+# YouTube Data API cost of one videos.insert call.
+UPLOAD_QUOTA_COST = 1600
+# ... and of one thumbnails.set call.
+THUMBNAIL_QUOTA_COST = 50
+
+# The daily quota resets at midnight Pacific time.
+_QUOTA_TZ = ZoneInfo("America/Los_Angeles")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS quota_usage (
+    project TEXT NOT NULL,
+    day TEXT NOT NULL,
+    units INTEGER NOT NULL,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (project, day)
+);
+"""
+
+
+class QuotaExhausted(RuntimeError):
+    """Raised instead of starting an upload the day's quota can't pay for."""
+
+    def __init__(self, message: str, retry_at: datetime):
+        super().__init__(message)
+        self.retry_at = retry_at
+
+
+def quota_day(now: datetime | None = None) -> str:
+    """The quota day (Pacific calendar date) ``now`` falls in."""
+    now = now or datetime.now(timezone.utc)
+    return now.astimezone(_QUOTA_TZ).date().isoformat()
+
+
+def next_reset(now: datetime | None = None) -> datetime:
+    """When the current quota day ends, in UTC."""
+    now = now or datetime.now(timezone.utc)
+    tomorrow = now.astimezone(_QUOTA_TZ).date() + timedelta(days=1)
+    return datetime.combine(tomorrow, dt_time(0), tzinfo=_QUOTA_TZ).astimezone(timezone.utc)
+
+
+class QuotaLedger:
+    """Persisted count of YouTube quota units spent per project and day.
+
+    Quota belongs to the Google Cloud project behind the OAuth client, so
+    profiles sharing a client id share one budget. Units are charged when
+    an upload session is started; they can't be refunded by the API, so
+    neither are they here.
+    """
+
+    def __init__(self, path: Path):
+        self._db = open_sqlite(path, _SCHEMA)
+        self._lock = threading.Lock()
+
+    def used(self, project: str, day: str | None = None) -> int:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT units FROM quota_usage WHERE project = ? AND day = ?", (project, day or quota_day())
+            ).fetchone()
+        return int(row[0]) if row else 0
+
+    def remaining(self, project: str, daily_limit: int) -> int:
+        return max(0, daily_limit - self.used(project))
+
+    def charge(self, project: str, units: int, daily_limit: int) -> None:
+        """Record ``units`` against today's quota, or raise ``QuotaExhausted``
+        if that would go over ``daily_limit``.
+        """
+        day = quota_day()
+        with self._lock:
+            row = self._db.execute(
+                "SELECT units FROM quota_usage WHERE project = ? AND day = ?", (project, day)
+            ).fetchone()
+            used = int(row[0]) if row else 0
+            if used + units > daily_limit:
+                retry_at = next_reset()
+                raise QuotaExhausted(
+                    f"YouTube quota used up for {day} ({used}/{daily_limit} units); resets {retry_at.isoformat()}",
+                    retry_at,
+                )
+            self._db.execute(
+                "INSERT INTO quota_usage (project, day, units, updated_at) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (project, day) DO UPDATE SET units = units + excluded.units, updated_at = excluded.updated_at",
+                (project, day, units, time.time()),
+            )
+
+    def exhaust(self, project: str, daily_limit: int) -> datetime:
+        """YouTube said the quota is gone: mark today as fully used and return the next reset."""
+        with self._lock:
+            self._db.execute(
+                "INSERT INTO quota_usage (project, day, units, updated_at) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (project, day) DO UPDATE SET units = MAX(units, excluded.units), "
+                "updated_at = excluded.updated_at",
+                (project, quota_day(), daily_limit, time.time()),
+            )
+        return next_reset()
+
+
+def open_quota_ledger(data_dir: Path) -> QuotaLedger:
+    """Shared ledger, kept in the job store's ``<data_dir>/jobs.sqlite3``."""
+    return shared(QuotaLedger, data_dir / "jobs.sqlite3")
@@ -0,0 +1,272 @@
+from __future__ import annotations
+
+import json
+from pathlib import Path
+import shutil
+import struct
+import subprocess
+import threading
+
+from .config import Config
+
+
+def check_tools(config: Config) -> None:
+    for tool in (config.ffmpeg_path, config.ffprobe_path):
+        if shutil.which(tool) is None:
+            raise RuntimeError(f"{tool} not found on PATH (needed by REMUX / HIGHLIGHTS / THUMBNAILS; see FFMPEG_PATH)")
+
+
+class _TempBudget:
+    """Bytes of remuxed copies allowed on disk at once; ``reserve`` blocks until there is room."""
+
+    def __init__(self, limit: int, used: int):
+        self._limit = limit
+        self._used = used
+        self._cond = threading.Condition()
+
+    def reserve(self, size: int) -> None:
+        with self._cond:
+            while self._used > 0 and self._used + size > self._limit:
+                self._cond.wait()
+            self._used += size
+
+    def release(self, size: int) -> None:
+        with self._cond:
+            self._used = max(0, self._used - size)
+            self._cond.notify_all()
+
+
+_BUDGETS: dict[Path, _TempBudget] = {}
+_BUDGETS_LOCK = threading.Lock()
+
+
+def _budget(config: Config) -> _TempBudget:
+    with _BUDGETS_LOCK:
+        budget = _BUDGETS.get(config.remux_dir)
+        if budget is None:
+            config.remux_dir.mkdir(parents=True, exist_ok=True)
+            # Copies kept from before a restart still take up space.
+            used = sum(p.stat().st_size for p in config.remux_dir.glob("*.mp4"))
+            budget = _TempBudget(int(config.remux_max_temp_gb * 1024**3), used)
+            _BUDGETS[config.remux_dir] = budget
+        return budget
+
+
+def probe(config: Config, path: Path) -> dict:
+    """ffprobe the container; raises RuntimeError if it is unreadable or has no video."""
+    proc = subprocess.run(
+        [
+            config.ffprobe_path,
+            "-v",
+            "error",
+            "-show_entries",
+            "format=format_name,duration:stream=codec_type,codec_name",
+            "-of",
+            "json",
+            str(path),
+        ],
+        stdin=subprocess.DEVNULL,
+        capture_output=True,
+        text=True,
+        timeout=120,
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"Broken video container {path.name}: {proc.stderr.strip() or 'ffprobe failed'}")
+
+    info = json.loads(proc.stdout or "{}")
+    streams = info.get("streams") or []
+    if not any(s.get("codec_type") == "video" for s in streams):
+        raise RuntimeError(f"Broken video container {path.name}: no video stream")
+    try:
+        duration = float((info.get("format") or {}).get("duration") or 0)
+    except ValueError:
+        duration = 0.0
+    if duration <= 0:
+        raise RuntimeError(f"Broken video container {path.name}: no duration (unfinished recording?)")
+    return info
+
+
+def is_faststart_mp4(path: Path) -> bool:
+    """True if the MP4 index (``moov``) comes before the media data (``mdat``).
+
+    Only walks the top-level box headers, so this reads a few bytes per box.
+    """
+    with open(path, "rb") as f:
+        while True:
+            header = f.read(8)
+            if len(header) < 8:
+                return False
+            size, box = struct.unpack(">I4s", header)
+            if box == b"moov":
+                return True
+            if box == b"mdat":
+                return False
+            if size == 1:
+                size = struct.unpack(">Q", f.read(8))[0]
+                f.seek(size - 16, 1)
+            elif size == 0:
+                return False
+            else:
+                f.seek(size - 8, 1)
+
+
+def needs_remux(path: Path) -> bool:
+    if path.suffix.lower() != ".mp4":
+        return True
+    try:
+        return not is_faststart_mp4(path)
+    except (OSError, struct.error):
+        return True
+
+
+def remuxed_path(config: Config, job_id: int, source: Path) -> Path:
+    return config.remux_dir / f"{job_id}-{source.stem}.mp4"
+
+
+def remux(config: Config, source: Path, target: Path) -> None:
+    """Copy the streams of ``source`` into a faststart MP4 at ``target``, without re-encoding.
+
+    ffmpeg streams file to file, so memory use doesn't depend on the video
+    size. Blocks while the temp space budget is full.
+    """
+    size = source.stat().st_size
+    budget = _budget(config)
+    budget.reserve(size)
+    partial = target.with_suffix(".partial")
+    try:
+        proc = subprocess.run(
+            [
+                config.ffmpeg_path,
+                "-nostdin",
+                "-hide_banner",
+                "-v",
+                "error",
+                "-y",
+                "-i",
+                str(source),
+                "-map",
+                "0:v",
+                "-map",
+                "0:a?",
+                "-c",
+                "copy",
+                "-movflags",
+                "+faststart",
+                "-f",
+                "mp4",
+                str(partial),
+            ],
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.PIPE,
+            text=True,
+        )
+        if proc.returncode != 0:
+            raise RuntimeError(f"ffmpeg remux of {source.name} failed: {proc.stderr.strip()[-500:]}")
+        partial.replace(target)
+    except BaseException:
+        partial.unlink(missing_ok=True)
+        budget.release(size)
+        raise
+    # Account for the copy's real size from now on.
+    budget.release(size - target.stat().st_size)
+
+
+def cut_clip(config: Config, source: Path, target: Path, *, start: float, duration: float) -> None:
+    """Copy ``duration`` seconds of ``source`` from ``start`` into an MP4 at ``target``, without re-encoding.
+
+    Seeking on the input makes ffmpeg start at the keyframe at or before
+    ``start``, so the clip opens on a clean frame (up to a GOP early).
+    """
+    partial = target.with_suffix(".partial")
+    proc = subprocess.run(
+        [
+            config.ffmpeg_path,
+            "-nostdin",
+            "-hide_banner",
+            "-v",
+            "error",
+            "-y",
+            "-ss",
+            f"{max(0.0, start):.3f}",
+            "-i",
+            str(source),
+            "-t",
+            f"{duration:.3f}",
+            "-map",
+            "0:v",
+            "-map",
+            "0:a?",
+            "-c",
+            "copy",
+            "-avoid_negative_ts",
+            "make_zero",
+            "-movflags",
+            "+faststart",
+            "-f",
+            "mp4",
+            str(partial),
+        ],
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+        text=True,
+    )
+    if proc.returncode != 0:
+        partial.unlink(missing_ok=True)
+        raise RuntimeError(f"ffmpeg clip of {source.name} at {start:.0f}s failed: {proc.stderr.strip()[-500:]}")
+    partial.replace(target)
+
+
+def grab_frame(config: Config, source: Path, target: Path, *, at: float) -> None:
+    """Write the frame at ``at`` seconds to ``target`` (an image file).
+
+    The seek happens on the input, so ffmpeg jumps to the nearest keyframe
+    and decodes only from there instead of from the start of the video.
+    """
+    proc = subprocess.run(
+        [
+            config.ffmpeg_path,
+            "-nostdin",
+            "-hide_banner",
+            "-v",
+            "error",
+            "-y",
+            "-ss",
+            f"{max(0.0, at):.3f}",
+            "-i",
+            str(source),
+            "-frames:v",
+            "1",
+            "-q:v",
+            "2",
+            str(target),
+        ],
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+        text=True,
+        timeout=120,
+    )
+    if proc.returncode != 0 or not target.exists():
+        raise RuntimeError(f"ffmpeg frame grab of {source.name} at {at:.0f}s failed: {proc.stderr.strip()[-500:]}")
+
+
+def discard(config: Config, path: Path) -> None:
+    """Delete a remuxed copy once it is no longer needed and free its temp space."""
+    try:
+        size = path.stat().st_size
+        path.unlink()
+    except FileNotFoundError:
+        return
+    _budget(config).release(size)
+
+
+def remove_orphans(config: Config, keep: set[Path]) -> None:
+    """Delete remuxed copies (and interrupted partial files) no unfinished job refers to."""
+    if not config.remux_dir.is_dir():
+        return
+    for path in config.remux_dir.iterdir():
+        if path.suffix == ".partial" or (path.suffix == ".mp4" and path not in keep):
+            print(f"[remux] removing leftover {path.name}")
+            path.unlink(missing_ok=True)
@@ -0,0 +1,51 @@
+from __future__ import annotations
+
+from contextlib import contextmanager
+from pathlib import Path
+import sqlite3
+import threading
+from typing import Any, Callable, Iterator, TypeVar
+
+
+T = TypeVar("T")
+
+
+def open_sqlite(path: Path, schema: str) -> sqlite3.Connection:
+    """Autocommit WAL connection to ``path`` with ``schema`` applied.
+
+    The connection may be used from any thread; callers serialize access
+    with their own lock.
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+    db = sqlite3.connect(str(path), check_same_thread=False, isolation_level=None)
+    db.execute("PRAGMA journal_mode=WAL")
+    db.execute("PRAGMA synchronous=NORMAL")
+    db.executescript(schema)
+    return db
+
+
+@contextmanager
+def transaction(db: sqlite3.Connection) -> Iterator[None]:
+    """Run the enclosed statements of an autocommit connection as one transaction."""
+    db.execute("BEGIN")
+    try:
+        yield
+    except BaseException:
+        db.execute("ROLLBACK")
+        raise
+    db.execute("COMMIT")
+
+
+_SHARED: dict[tuple[Callable[..., Any], Path], Any] = {}
+_SHARED_LOCK = threading.Lock()
+
+
+def shared(factory: Callable[..., T], path: Path, *args: Any) -> T:
+    """The process-wide ``factory(path, *args)`` for ``path``, created on first use."""
+    key = (factory, path.resolve())
+    with _SHARED_LOCK:
+        store = _SHARED.get(key)
+        if store is None:
+            store = factory(path, *args)
+            _SHARED[key] = store
+        return store
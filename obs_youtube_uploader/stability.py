@@ -0,0 +1,116 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from pathlib import Path
+import threading
+import time
+from typing import Callable
+
+
+@dataclass
+class _Pending:
+    size: int = -1
+    last_change: float = 0.0
+    closed: bool = False
+
+
+class StabilityTracker:
+    """Tracks files that are still being written and releases them once done.
+
+    A file is released as soon as a close-after-write event arrives for it,
+    or once it has been quiet (no modify events, unchanged size) for
+    ``quiet_seconds``. All pending files are tracked by one thread, and sizes
+    are only re-checked every ``poll_interval`` seconds as a fallback for
+    mounts that don't deliver events. Files deleted or renamed away before
+    they settle are dropped and passed to ``on_gone``, if given.
+    """
+
+    def __init__(
+        self,
+        on_stable: Callable[[Path], None],
+        *,
+        quiet_seconds: float,
+        poll_interval: float,
+        on_gone: Callable[[Path], None] | None = None,
+    ):
+        self._on_stable = on_stable
+        self._on_gone = on_gone
+        self._quiet_seconds = quiet_seconds
+        self._poll_interval = poll_interval
+        self._pending: dict[Path, _Pending] = {}
+        self._cond = threading.Condition()
+        self._stopped = False
+        self._thread: threading.Thread | None = None
+
+    def track(self, path: Path) -> None:
+        with self._cond:
+            if path not in self._pending:
+                self._pending[path] = _Pending(last_change=time.monotonic())
+
+    def touch(self, path: Path) -> None:
+        """A write happened: restart the quiet period."""
+        with self._cond:
+            pending = self._pending.get(path)
+            if pending is not None:
+                pending.last_change = time.monotonic()
+
+    def closed(self, path: Path) -> None:
+        """The writer closed the file: release it on the next pass."""
+        with self._cond:
+            pending = self._pending.get(path)
+            if pending is not None:
+                pending.closed = True
+                self._cond.notify()
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self._run, name="stability", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 10.0) -> None:
+        with self._cond:
+            self._stopped = True
+            self._cond.notify()
+        if self._thread is not None:
+            self._thread.join(timeout=timeout)
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                self._cond.wait(timeout=self._poll_interval)
+                if self._stopped:
+                    return
+                ready, gone = self._collect_ready()
+
+            for path in gone:
+                print(f"[stable:gone] {path.name}")
+                if self._on_gone is not None:
+                    self._on_gone(path)
+            for path in ready:
+                print(f"[stable] {path.name}")
+                self._on_stable(path)
+
+    def _collect_ready(self) -> tuple[list[Path], list[Path]]:
+        now = time.monotonic()
+        ready: list[Path] = []
+        gone: list[Path] = []
+        for path, pending in list(self._pending.items()):
+            try:
+                size = path.stat().st_size
+            except FileNotFoundError:
+                # Deleted (or renamed away) before it settled; forget it.
+                if now - pending.last_change >= self._quiet_seconds:
+                    del self._pending[path]
+                    gone.append(path)
+                continue
+
+            if size != pending.size:
+                pending.size = size
+                if not pending.closed:
+                    pending.last_change = now
+            if size <= 0:
+                continue
+
+            if pending.closed or now - pending.last_change >= self._quiet_seconds:
+                del self._pending[path]
+                ready.append(path)
+        return ready, gone
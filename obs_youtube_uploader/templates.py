@@ -0,0 +1,219 @@
+from __future__ import annotations
+
+from dataclasses import dataclass, fields
+from functools import lru_cache
+from operator import attrgetter
+from string import Formatter
+from typing import Any, Callable
+
+from .description import MatchContext
+
+
+# Template syntax: ``{field}`` (with optional ``:format_spec``) is replaced by
+# a MatchContext value; ``[...]`` is an optional part that is left out when
+# any field in it is empty (None or ""). ``{{ }} [[ ]]`` are literal braces
+# and brackets.
+
+DEFAULT_TITLE_TEMPLATE = "{hero} Gameplay[ | Patch {patch}] | {result} | {duration_min}min | Dota 2 | Match {match_id}"
+
+DEFAULT_DESCRIPTION_TEMPLATE = """\
+Match ID: {match_id}
+Recording start (UTC): {recording_start}Z
+Match start (UTC): {match_start}Z
+Duration: {duration}
+Winner: {winner}
+Score: {score}[
+
+Player
+Account ID: {account_id}
+Hero: {hero}
+K/D/A: {kda}
+
+Items
+Main: {main_items}
+Backpack: {backpack_items}
+Neutral: {neutral_item}][
+
+Chapters
+{chapters}]
+
+Links
+OpenDota match: {match_url}
+
+Video
+Hero: {hero}
+[Patch: {patch}
+][Items: {items}
+]Match: {match_url}
+
+#dota2 #dota #opendota
+[
+Thumbnail Prompt
+{thumbnail_prompt}
+]"""
+
+# One tag per line. Consecutive lines using ``{item}`` are repeated for
+# each of the player's first 10 items.
+DEFAULT_TAGS_TEMPLATE = """\
+dota 2
+dota2
+{hero}
+{hero} gameplay
+dota 2 gameplay
+dota 2 ranked
+dota 2 highlights
+dota 2 build
+dota 2 items
+dota patch
+opendota
+[dota 2 patch {patch}]
+[patch {patch}]
+{item}
+{hero} {item}
+"""
+
+_MAX_TAGS = 35
+_MAX_TAG_ITEMS = 10
+
+_FIELDS = frozenset(f.name for f in fields(MatchContext))
+_FORMATTER = Formatter()
+
+# (literal text, value getter or None, format spec) pieces of one segment.
+_Piece = tuple[str, Callable[[MatchContext, str | None], Any] | None, str]
+
+
+def _split_optional(text: str) -> list[tuple[str, bool]]:
+    """Split a template into (text, optional) segments at ``[`` / ``]``."""
+    segments: list[tuple[str, bool]] = []
+    buf: list[str] = []
+    optional = False
+    i = 0
+    while i < len(text):
+        ch = text[i]
+        if ch in "[]" and text[i + 1 : i + 2] == ch:
+            buf.append(ch)
+            i += 2
+            continue
+        if ch == "[":
+            if optional:
+                raise RuntimeError("Template error: optional parts can't be nested")
+            segments.append(("".join(buf), False))
+            buf, optional = [], True
+        elif ch == "]":
+            if not optional:
+                raise RuntimeError("Template error: ']' without '['")
+            segments.append(("".join(buf), True))
+            buf, optional = [], False
+        else:
+            buf.append(ch)
+        i += 1
+    if optional:
+        raise RuntimeError("Template error: '[' is never closed")
+    segments.append(("".join(buf), False))
+    return [s for s in segments if s[0]]
+
+
+def _getter(name: str, allow_item: bool) -> Callable[[MatchContext, str | None], Any]:
+    if name == "item" and allow_item:
+        return lambda ctx, item: item
+    if name not in _FIELDS:
+        raise RuntimeError(f"Template error: unknown field {{{name}}}")
+    get = attrgetter(name)
+    return lambda ctx, item: get(ctx)
+
+
+def _compile_segment(text: str, allow_item: bool) -> tuple[tuple[_Piece, ...], tuple[Callable, ...]]:
+    pieces: list[_Piece] = []
+    getters: list[Callable] = []
+    try:
+        parsed = list(_FORMATTER.parse(text))
+    except ValueError as err:
+        raise RuntimeError(f"Template error: {err}") from err
+    for literal, name, spec, conversion in parsed:
+        if name is None:
+            pieces.append((literal, None, ""))
+            continue
+        if conversion:
+            raise RuntimeError(f"Template error: conversions like !{conversion} aren't supported")
+        get = _getter(name, allow_item)
+        pieces.append((literal, get, spec or ""))
+        getters.append(get)
+    return tuple(pieces), tuple(getters)
+
+
+def _compile(text: str, allow_item: bool) -> Callable[[MatchContext, str | None], str]:
+    compiled = [(*_compile_segment(seg, allow_item), optional) for seg, optional in _split_optional(text)]
+
+    def render(ctx: MatchContext, item: str | None = None) -> str:
+        out: list[str] = []
+        for pieces, getters, optional in compiled:
+            if optional and any(get(ctx, item) in (None, "") for get in getters):
+                continue
+            for literal, get, spec in pieces:
+                out.append(literal)
+                if get is not None:
+                    out.append(format(get(ctx, item), spec))
+        return "".join(out)
+
+    return render
+
+
+@lru_cache(maxsize=None)
+def compile_template(text: str) -> Callable[[MatchContext], str]:
+    """Compile a title/description template into a render function (cached per template text).
+
+    Raises RuntimeError for syntax errors and unknown fields, so bad
+    templates fail at startup rather than at the first upload.
+    """
+    return _compile(text, allow_item=False)
+
+
+@lru_cache(maxsize=None)
+def compile_tags_template(text: str) -> Callable[[MatchContext], list[str]]:
+    """Compile a tags template (one tag per line) into a render function returning the tag list.
+
+    Empty and repeated (case-insensitive) tags are dropped; at most 35 are kept.
+    """
+    # Blocks of lines rendered once, or once per item for lines using {item}.
+    blocks: list[tuple[bool, list[Callable[[MatchContext, str | None], str]]]] = []
+    for line in text.splitlines():
+        if not line.strip():
+            continue
+        render_line = _compile(line, allow_item=True)
+        per_item = "item" in {name for _, name, _, _ in _FORMATTER.parse(line) if name}
+        if not blocks or blocks[-1][0] != per_item:
+            blocks.append((per_item, []))
+        blocks[-1][1].append(render_line)
+
+    def render(ctx: MatchContext) -> list[str]:
+        tags: list[str] = []
+        seen: set[str] = set()
+
+        def add(tag: str) -> None:
+            tag = tag.strip()
+            if tag and tag.lower() not in seen:
+                seen.add(tag.lower())
+                tags.append(tag)
+
+        for per_item, lines in blocks:
+            for item in ctx.item_names[:_MAX_TAG_ITEMS] if per_item else (None,):
+                for line in lines:
+                    add(line(ctx, item))
+        return tags[:_MAX_TAGS]
+
+    return render
+
+
+@dataclass(frozen=True, slots=True)
+class Templates:
+    title: Callable[[MatchContext], str]
+    description: Callable[[MatchContext], str]
+    tags: Callable[[MatchContext], list[str]]
+
+
+def load_templates(title: str, description: str, tags: str) -> Templates:
+    return Templates(
+        title=compile_template(title),
+        description=compile_template(description),
+        tags=compile_tags_template(tags),
+    )
@@ -0,0 +1,123 @@
+from __future__ import annotations
+
+from concurrent.futures import Future, ProcessPoolExecutor
+from functools import lru_cache
+import multiprocessing
+from pathlib import Path
+import threading
+
+from PIL import Image, ImageDraw, ImageFont, ImageOps
+
+
+THUMBNAIL_SIZE = (1280, 720)
+
+# Tried in order when THUMBNAIL_FONT isn't set (the Docker image has DejaVu).
+_FONT_CANDIDATES = (
+    "/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf",
+    "/usr/share/fonts/TTF/DejaVuSans-Bold.ttf",
+    "C:/Windows/Fonts/arialbd.ttf",
+)
+
+_WIN_COLOR = (46, 160, 67)
+_LOSS_COLOR = (200, 40, 40)
+_MARGIN = 48
+
+
+# Template assets: built once per worker process and reused for every thumbnail.
+
+
+@lru_cache(maxsize=None)
+def _font(font_path: str | None, size: int) -> ImageFont.FreeTypeFont | ImageFont.ImageFont:
+    for candidate in ([font_path] if font_path else []) + list(_FONT_CANDIDATES):
+        try:
+            return ImageFont.truetype(candidate, size)
+        except OSError:
+            continue
+    return ImageFont.load_default(size)
+
+
+@lru_cache(maxsize=1)
+def _shade() -> Image.Image:
+    """Black overlay fading in towards the bottom, so the hero name stays readable on any frame."""
+    w, h = THUMBNAIL_SIZE
+    column = Image.linear_gradient("L").resize((1, h))
+    alpha = column.point(lambda v: max(0, v - 64) * 230 // 191).resize((w, h))
+    overlay = Image.new("RGBA", THUMBNAIL_SIZE, (0, 0, 0, 0))
+    overlay.putalpha(alpha)
+    return overlay
+
+
+@lru_cache(maxsize=8)
+def _badge(text: str, font_path: str | None) -> Image.Image:
+    font = _font(font_path, 96)
+    left, top, right, bottom = font.getbbox(text)
+    pad = 28
+    badge = Image.new("RGBA", (right - left + 2 * pad, bottom - top + 2 * pad), (0, 0, 0, 0))
+    draw = ImageDraw.Draw(badge)
+    color = _WIN_COLOR if text == "WIN" else _LOSS_COLOR
+    draw.rounded_rectangle((0, 0, badge.width - 1, badge.height - 1), radius=24, fill=color + (235,))
+    draw.text((pad - left, pad - top), text, font=font, fill="white")
+    return badge
+
+
+def _fitted_font(draw: ImageDraw.ImageDraw, text: str, font_path: str | None, max_width: int):
+    for size in range(160, 40, -8):
+        font = _font(font_path, size)
+        if draw.textlength(text, font=font) <= max_width:
+            return font
+    return _font(font_path, 40)
+
+
+def render_thumbnail(
+    frame_path: str, out_path: str, *, hero: str, result: str, patch: str | None, font_path: str | None
+) -> str:
+    """Composite the frame, hero name, W/L badge and patch into a 1280x720 JPEG at ``out_path``.
+
+    Runs in a worker process; needs no network.
+    """
+    with Image.open(frame_path) as frame:
+        image = ImageOps.fit(frame.convert("RGB"), THUMBNAIL_SIZE, Image.Resampling.LANCZOS).convert("RGBA")
+    image.alpha_composite(_shade())
+
+    badge = _badge(result.upper(), font_path)
+    image.alpha_composite(badge, (THUMBNAIL_SIZE[0] - badge.width - _MARGIN, _MARGIN))
+
+    draw = ImageDraw.Draw(image)
+    if patch:
+        draw.text(
+            (_MARGIN, _MARGIN),
+            f"PATCH {patch}",
+            font=_font(font_path, 64),
+            fill="white",
+            stroke_width=4,
+            stroke_fill="black",
+            anchor="lt",
+        )
+    name = hero.upper()
+    draw.text(
+        (_MARGIN, THUMBNAIL_SIZE[1] - _MARGIN),
+        name,
+        font=_fitted_font(draw, name, font_path, THUMBNAIL_SIZE[0] - 2 * _MARGIN),
+        fill="white",
+        stroke_width=6,
+        stroke_fill="black",
+        anchor="ls",
+    )
+
+    image.convert("RGB").save(out_path, "JPEG", quality=90, optimize=True)
+    return out_path
+
+
+_POOL: ProcessPoolExecutor | None = None
+_POOL_LOCK = threading.Lock()
+
+
+def submit_render(workers: int, frame_path: Path, out_path: Path, **kwargs) -> Future[str]:
+    """Render on the shared process pool (``workers`` processes, created on first use)."""
+    global _POOL
+    with _POOL_LOCK:
+        if _POOL is None:
+            # spawn: forking a process that runs threads can copy held locks.
+            _POOL = ProcessPoolExecutor(max_workers=max(1, workers), mp_context=multiprocessing.get_context("spawn"))
+        pool = _POOL
+    return pool.submit(render_thumbnail, str(frame_path), str(out_path), **kwargs)
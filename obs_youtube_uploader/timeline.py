@@ -0,0 +1,102 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+import heapq
+from typing import Iterator
+
+from .match_model import Match, PlayerSummary
+
+
+# YouTube ignores chapter lists with a chapter shorter than this.
+MIN_CHAPTER_SEC = 10
+
+# When events fall into one chapter, the highest ranked one names it.
+_RANK = {"Kill": 0, "First Blood": 1, "Tower": 2, "Teamfight": 3, "Barracks": 4, "Roshan": 5}
+
+# Event = (game time in seconds, label). Each source yields in time order.
+_Event = tuple[int, str]
+
+
+@dataclass(frozen=True)
+class Chapter:
+    start: int
+    title: str
+
+
+def _objectives(match: Match) -> Iterator[_Event]:
+    for obj in match.objectives:
+        kind, key = obj.type, obj.key
+        if kind == "CHAT_MESSAGE_ROSHAN_KILL":
+            label = "Roshan"
+        elif kind == "CHAT_MESSAGE_FIRSTBLOOD":
+            label = "First Blood"
+        elif kind == "building_kill" and "_rax_" in key:
+            label = "Barracks"
+        elif kind == "building_kill" and "tower" in key:
+            label = "Tower"
+        else:
+            continue
+        yield obj.time, label
+
+
+def _teamfights(match: Match) -> Iterator[_Event]:
+    for fight in match.teamfights:
+        yield fight.start, "Teamfight"
+
+
+def _kills(player: PlayerSummary | None) -> Iterator[_Event]:
+    for at in player.kill_times if player else ():
+        yield at, "Kill"
+
+
+def _format_timestamp(seconds: int) -> str:
+    h, rest = divmod(seconds, 3600)
+    m, s = divmod(rest, 60)
+    return f"{h}:{m:02d}:{s:02d}" if h else f"{m:02d}:{s:02d}"
+
+
+def build_chapters(
+    match: Match, player: PlayerSummary | None, offset_sec: float, *, length_sec: float, min_gap_sec: int
+) -> list[Chapter]:
+    """YouTube chapters from the match's objectives, teamfights and the player's kills.
+
+    ``offset_sec`` is where game time 0 falls in the recording (see
+    ``highlights.game_time_offset``) and ``length_sec`` is how long the
+    recording is. Each event list of the parsed match is in time order, so
+    the lists are merged and grouped in a single pass: an event less than
+    ``min_gap_sec`` after the current chapter's start joins that chapter,
+    and the highest ranked event in it names it. Events at or past the end
+    of the recording are dropped, and a last chapter shorter than
+    ``min_gap_sec`` joins the one before it. Returns an empty list when the
+    match doesn't yield the three chapters YouTube needs.
+    """
+    gap = max(MIN_CHAPTER_SEC, min_gap_sec)
+    horn = round(offset_sec)
+    chapters = [Chapter(0, "Pre-game"), Chapter(horn, "Laning")] if horn >= gap else [Chapter(0, "Laning")]
+    # The opening chapters keep their names.
+    ranks = [len(_RANK)] * len(chapters)
+
+    for game_time, label in heapq.merge(_objectives(match), _teamfights(match), _kills(player)):
+        at = round(offset_sec + game_time)
+        if at >= length_sec:
+            break
+        last = chapters[-1]
+        if at - last.start < gap:
+            if _RANK[label] > ranks[-1]:
+                chapters[-1] = Chapter(last.start, label)
+                ranks[-1] = _RANK[label]
+            continue
+        chapters.append(Chapter(at, label))
+        ranks.append(_RANK[label])
+
+    while len(chapters) > 1 and length_sec - chapters[-1].start < gap:
+        last, rank = chapters.pop(), ranks.pop()
+        if rank > ranks[-1]:
+            chapters[-1] = Chapter(chapters[-1].start, last.title)
+            ranks[-1] = rank
+
+    return chapters if len(chapters) >= 3 else []
+
+
+def format_chapters(chapters: list[Chapter]) -> list[str]:
+    return [f"{_format_timestamp(c.start)} {c.title}" for c in chapters]
@@ -1,91 +1,280 @@
 from __future__ import annotations
 
 from dataclasses import dataclass
-import os
+from datetime import datetime, timezone
 from pathlib import Path
-import queue
 import time
 
 from watchdog.events import FileSystemEventHandler
-from watchdog.observers.polling import PollingObserver
+from watchdog.observers import Observer
 
-from .config import Config
-from .process_video import process_video
+from .config import Config, load_profiles
+from .dir_scanner import DirectoryScanner, filesystem_type, supports_native_events
+from .fingerprint import fingerprint_uploaded
+from .jobs import Job, JobStore, open_job_store
+from .notify import flush_notifications, start_notifier
+from .pipeline import Stage
+from .process_video import extract_highlights, prepare_video, remux_video, resolve_match_ids, upload_video
+from .quota import QuotaExhausted
+from .remux import check_tools, remove_orphans
+from .stability import StabilityTracker
 
 
 def _is_wanted(file_path: Path, exts: set[str]) -> bool:
     return file_path.suffix.lower() in exts
 
 
-def _wait_for_stable(file_path: Path, *, stable_seconds: int = 20, poll_interval: float = 2.0) -> None:
-    last_size = -1
-    stable_for = 0.0
-
-    while True:
-        try:
-            size = file_path.stat().st_size
-        except FileNotFoundError:
-            time.sleep(poll_interval)
-            continue
-
-        if size == last_size and size > 0:
-            stable_for += poll_interval
-            if stable_for >= stable_seconds:
-                return
-        else:
-            stable_for = 0.0
-            last_size = size
-
-        time.sleep(poll_interval)
-
-
 @dataclass
 class _WorkItem:
     path: Path
+    config: Config
+    match_id: int | None = None
 
 
 class _Handler(FileSystemEventHandler):
-    def __init__(self, config: Config, work_q: queue.Queue[_WorkItem]):
+    def __init__(self, config: Config, tracker: StabilityTracker):
         super().__init__()
         self._config = config
-        self._q = work_q
+        self._tracker = tracker
 
-    def on_created(self, event):
+    def _wanted_path(self, event) -> Path | None:
         if event.is_directory:
-            return
+            return None
         p = Path(event.src_path)
-        if not _is_wanted(p, self._config.video_extensions):
-            return
-        self._q.put(_WorkItem(path=p))
+        return p if _is_wanted(p, self._config.video_extensions) else None
+
+    def on_created(self, event):
+        p = self._wanted_path(event)
+        if p is not None:
+            self._tracker.track(p)
+
+    def on_modified(self, event):
+        p = self._wanted_path(event)
+        if p is not None:
+            self._tracker.touch(p)
+
+    def on_closed(self, event):
+        # Only delivered by the inotify observer (IN_CLOSE_WRITE).
+        p = self._wanted_path(event)
+        if p is not None:
+            self._tracker.closed(p)
+
+
+def _watch_mode(config: Config) -> str:
+    """``WATCH_MODE=auto`` picks native events unless the watch folder sits on a
+    mount that doesn't deliver them (e.g. Docker Desktop bind mounts).
+    """
+    if config.watch_mode != "auto":
+        return config.watch_mode
+    fstype = filesystem_type(config.watch_folder)
+    mode = "native" if supports_native_events(config.watch_folder) else "polling"
+    print(f"[watcher] {config.watch_folder}: filesystem={fstype or 'unknown'} -> {mode} mode")
+    return mode
+
+
+def _start_observers(profiles: list[Config], tracker: StabilityTracker) -> list[Observer | DirectoryScanner]:
+    """Start one native (inotify) observer for every natively watched folder,
+    and an incremental polling scanner per folder that needs polling.
+    """
+    observers: list[Observer | DirectoryScanner] = []
+    native: Observer | None = None
+    for config in profiles:
+        handler = _Handler(config, tracker)
+        if _watch_mode(config) == "native":
+            if native is None:
+                native = Observer()
+                observers.append(native)
+            native.schedule(handler, str(config.watch_folder), recursive=False)
+        else:
+            scanner = DirectoryScanner(config.watch_folder, handler, interval=config.watch_poll_sec)
+            scanner.start()
+            observers.append(scanner)
+    if native is not None:
+        native.start()
+    return observers
+
+
+def _build_pipeline(config: Config, profiles: dict[str, Config], jobs: JobStore) -> list[Stage]:
+    """Stages in upstream -> downstream order: describe -> [remux] -> upload,
+    plus a [highlights] branch off describe.
+
+    Files enter the describe stage once the stability tracker releases them.
+    The remux stage (``REMUX=true``) rejects broken containers and rewrites
+    files into faststart MP4s before any upload bandwidth is spent.
+    With ``HIGHLIGHTS=true`` described recordings are also handed to the
+    highlights stage, which cuts clips next to the full upload and feeds
+    them into the same remux/upload stages.
+    All stages are shared by all profiles and serve them round-robin.
+    Uploads that find the YouTube quota used up wait for the next reset.
+    """
+
+    def _upload(job: Job) -> None:
+        try:
+            upload_video(profiles[job.profile], jobs, job)
+        except QuotaExhausted as err:
+            delay = (err.retry_at - datetime.now(timezone.utc)).total_seconds()
+            print(f"[upload:deferred] {job.path.name} until {err.retry_at.isoformat()}: {err}")
+            # A little past the reset, so the ledger has rolled over to the new day.
+            upload_stage.put_later(job, delay + 30)
+
+    def _describe(item: _WorkItem) -> Job | None:
+        job = jobs.job_for(item.path, profile=item.config.profile)
+        if job.done:
+            print(f"[skip] {item.path.name} already processed (videoId={job.video_id})")
+            return None
+        prepared = prepare_video(item.config, jobs, job, match_id=item.match_id)
+        if prepared is not None and highlights_stage is not None:
+            highlights_stage.put(prepared)
+        return prepared
+
+    def _highlights(job: Job) -> None:
+        for clip in extract_highlights(profiles[job.profile], jobs, job):
+            stages[0].put(clip)
+
+    upload_stage = Stage(
+        "upload",
+        _upload,
+        workers=config.upload_workers,
+        maxsize=config.stage_queue_size,
+        fair_key=lambda job: job.profile,
+        # Newest first: the most recent recording (by file mtime) goes next.
+        priority=(lambda job: -job.mtime_ns) if config.upload_order == "newest" else None,
+    )
+    stages = [upload_stage]
+    if config.remux_enabled:
+        remux_stage = Stage(
+            "remux",
+            lambda job: remux_video(profiles[job.profile], jobs, job),
+            workers=config.remux_workers,
+            maxsize=config.stage_queue_size,
+            downstream=upload_stage,
+            fair_key=lambda job: job.profile,
+        )
+        stages.insert(0, remux_stage)
+    highlights_stage: Stage | None = None
+    if config.highlights_enabled:
+        # One recording at a time; each one's clips are cut in parallel.
+        highlights_stage = Stage(
+            "highlights",
+            _highlights,
+            workers=1,
+            maxsize=config.stage_queue_size,
+            fair_key=lambda job: job.profile,
+        )
+    describe_stage = Stage(
+        "describe",
+        _describe,
+        workers=config.describe_workers,
+        maxsize=config.stage_queue_size,
+        downstream=stages[0],
+        fair_key=lambda item: item.config.profile,
+    )
+    return [describe_stage, *([highlights_stage] if highlights_stage is not None else []), *stages]
+
+
+def _existing_files(config: Config, jobs: JobStore, skip: set[Path]) -> list[Path]:
+    existing: list[Path] = []
+    for entry in sorted(config.watch_folder.iterdir()):
+        if not entry.is_file() or not _is_wanted(entry, config.video_extensions):
+            continue
+        if entry in skip:
+            continue
+        job = jobs.find(entry)
+        if job is not None and job.done:
+            continue
+        existing.append(entry)
+    return existing
 
 
 def run_watcher(config: Config) -> None:
-    config.watch_folder.mkdir(parents=True, exist_ok=True)
+    """Watch every profile's folder (see ``load_profiles``) in this one process.
+
+    Workers, the job store and the OpenDota client are shared; each file is
+    processed with its own profile's settings.
+    """
+    profiles = load_profiles(config)
+    by_name = {p.profile: p for p in profiles}
+    by_folder = {p.watch_folder: p for p in profiles}
+    for profile in profiles:
+        profile.watch_folder.mkdir(parents=True, exist_ok=True)
+
+    jobs = open_job_store(config.data_dir)
+    fingerprint_uploaded(jobs)
+    start_notifier(config)
+    if config.remux_enabled or config.highlights_enabled or config.thumbnails_enabled:
+        check_tools(config)
+    if config.remux_enabled:
+        remove_orphans(config, {job.upload_path for job in jobs.pending() if job.upload_path is not None})
+    stages = _build_pipeline(config, by_name, jobs)
+    for stage in stages:
+        stage.start()
+    describe_stage = stages[0]
+
+    # Batch-resolved match ids for PROCESS_EXISTING files, picked up on release.
+    match_ids: dict[Path, int | None] = {}
 
-    work_q: queue.Queue[_WorkItem] = queue.Queue()
+    def _on_stable(path: Path) -> None:
+        describe_stage.put(_WorkItem(path=path, config=by_folder[path.parent], match_id=match_ids.get(path)))
 
-    observer = PollingObserver(timeout=2)
-    observer.schedule(_Handler(config, work_q), str(config.watch_folder), recursive=False)
-    observer.start()
+    # Wait for OBS to finish writing before a file enters the pipeline.
+    tracker = StabilityTracker(
+        _on_stable,
+        quiet_seconds=config.stable_seconds,
+        poll_interval=config.stable_poll_sec,
+    )
+    tracker.start()
 
-    print(f"[watcher] watching: {config.watch_folder}")
+    observers = _start_observers(profiles, tracker)
+
+    for profile in profiles:
+        print(f"[watcher] watching: {profile.watch_folder} (profile={profile.profile} player={profile.opendota_player_id})")
+    limit = f"{config.upload_max_mbps:g}MB/s" if config.upload_max_mbps > 0 else "unlimited"
+    print(
+        f"[watcher] workers: describe={config.describe_workers} upload={config.upload_workers} "
+        f"(order={config.upload_order}, bandwidth={limit})"
+        + (f" remux={config.remux_workers}" if config.remux_enabled else "")
+        + (f" highlights={config.highlight_workers}" if config.highlights_enabled else "")
+    )
 
     try:
+        # Resume unfinished work first; these files were already stable when
+        # their job was created, so they skip the stability wait.
+        resumed: set[Path] = set()
+        for job in jobs.pending():
+            if not jobs.is_current(job):
+                continue
+            profile = by_name.get(job.profile)
+            if profile is None:
+                print(f"[watcher] not resuming {job.path.name}: profile '{job.profile}' is not configured")
+                continue
+            print(f"[watcher] resuming {job.path.name} after stage '{job.stage}'")
+            resumed.add(job.path)
+            describe_stage.put(_WorkItem(path=job.path, config=profile, match_id=job.match_id))
+
         if config.process_existing:
-            for entry in sorted(config.watch_folder.iterdir()):
-                if entry.is_file() and _is_wanted(entry, config.video_extensions):
-                    work_q.put(_WorkItem(path=entry))
+            for profile in profiles:
+                existing = _existing_files(profile, jobs, resumed)
+                # One index query + sweep for the whole folder instead of one lookup per file.
+                try:
+                    match_ids.update(resolve_match_ids(profile, existing))
+                except Exception as err:
+                    print(f"[watcher] batch match resolution failed, resolving per file: {err}")
+                for entry in existing:
+                    tracker.track(entry)
 
         while True:
-            item = work_q.get()
-
-            # Wait for OBS to finish writing.
-            _wait_for_stable(item.path, stable_seconds=20, poll_interval=2.0)
-
-            process_video(config, item.path)
+            time.sleep(1.0)
 
     except KeyboardInterrupt:
         print("[watcher] stopping...")
     finally:
-        observer.stop()
-        observer.join(timeout=10)
+        for observer in observers:
+            observer.stop()
+        for observer in observers:
+            observer.join(timeout=10)
+        tracker.stop()
+        for stage in stages:
+            stage.stop()
+        left = flush_notifications(config, timeout=5.0)
+        if left:
+            print(f"[watcher] {left} webhook event(s) still queued; they are sent on the next start")
@@ -1,13 +1,269 @@
 from __future__ import annotations
 
-from typing import Any
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+import http.client
+import io
+import json
+import mimetypes
+import socket
+import threading
+import time
+from typing import Any, Callable
 
 from google.auth.transport.requests import Request
 from google.oauth2.credentials import Credentials
+from google_auth_httplib2 import AuthorizedHttp
 from googleapiclient.discovery import build
-from googleapiclient.http import MediaFileUpload
+from googleapiclient.errors import HttpError
+from googleapiclient.http import MediaFileUpload, MediaIoBaseUpload, build_http
+import httplib2
 
 from .config import Config
+from .http_client import RetryPolicy, TokenBucket
+
+
+# Chunk failures worth retrying: server-side errors, dropped connections,
+# timeouts and DNS failures.
+# Local file errors (missing or unreadable file) are not retried.
+_RETRY_STATUSES = {500, 502, 503, 504}
+_RETRY_EXCEPTIONS = (
+    httplib2.HttpLib2Error,
+    http.client.HTTPException,
+    ConnectionError,
+    TimeoutError,
+    socket.gaierror,
+)
+
+
+# Resumable upload chunks must be a multiple of 256 KiB.
+_CHUNK_ALIGN = 256 * 1024
+
+
+def _chunk_size_bytes(chunk_mb: float) -> int:
+    return max(_CHUNK_ALIGN, int(chunk_mb * 1024 * 1024) // _CHUNK_ALIGN * _CHUNK_ALIGN)
+
+
+@dataclass(frozen=True)
+class UploadProgress:
+    file_path: str
+    bytes_sent: int
+    total_bytes: int
+    # Throughput of the last chunk and since this upload attempt started, in MB/s.
+    chunk_mbps: float
+    avg_mbps: float
+    eta_sec: float | None
+
+    def log_line(self) -> str:
+        pct = 100.0 * self.bytes_sent / self.total_bytes if self.total_bytes else 100.0
+        eta = f"{self.eta_sec:.0f}s" if self.eta_sec is not None else "?"
+        return (
+            f"[upload:progress] file={self.file_path} sent={self.bytes_sent} total={self.total_bytes} "
+            f"pct={pct:.1f} rate_mbps={self.chunk_mbps:.2f} avg_mbps={self.avg_mbps:.2f} eta={eta}"
+        )
+
+
+class _ThroughputMeter:
+    def __init__(self, file_path: str, total_bytes: int, start_offset: int):
+        self._file_path = file_path
+        self._total = total_bytes
+        self._start_offset = start_offset
+        self._started = time.monotonic()
+        self._last_offset = start_offset
+        self._last_time = self._started
+
+    def chunk_done(self, offset: int) -> UploadProgress:
+        now = time.monotonic()
+        chunk_mbps = (offset - self._last_offset) / max(now - self._last_time, 1e-6) / 1e6
+        avg_mbps = (offset - self._start_offset) / max(now - self._started, 1e-6) / 1e6
+        self._last_offset = offset
+        self._last_time = now
+        eta = (self._total - offset) / (avg_mbps * 1e6) if avg_mbps > 0 else None
+        return UploadProgress(
+            file_path=self._file_path,
+            bytes_sent=offset,
+            total_bytes=self._total,
+            chunk_mbps=chunk_mbps,
+            avg_mbps=avg_mbps,
+            eta_sec=eta,
+        )
+
+    def restart_chunk(self) -> None:
+        """Don't count time spent on failed attempts and backoff against the next chunk."""
+        self._last_time = time.monotonic()
+
+
+# Largest read the throttle hands out at once; http.client sends a
+# streamed body in 8 KiB blocks, so this only caps unusual callers.
+_THROTTLE_BLOCK = 64 * 1024
+
+
+class _ThrottledReader(io.RawIOBase):
+    """Seekable file wrapper whose reads draw from a shared byte-rate bucket.
+
+    Chunks are streamed from the file while they are sent, so pacing the
+    reads paces the upload itself.
+    """
+
+    def __init__(self, raw: io.BufferedReader, limiter: TokenBucket):
+        self._raw = raw
+        self._limiter = limiter
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        return self._raw.seek(offset, whence)
+
+    def tell(self) -> int:
+        return self._raw.tell()
+
+    def read(self, size: int = -1) -> bytes:
+        size = _THROTTLE_BLOCK if size < 0 else min(size, _THROTTLE_BLOCK)
+        self._limiter.acquire(size)
+        return self._raw.read(size)
+
+    def close(self) -> None:
+        self._raw.close()
+        super().close()
+
+
+_BANDWIDTH: TokenBucket | None = None
+_BANDWIDTH_RATE = 0.0
+_BANDWIDTH_LOCK = threading.Lock()
+
+
+def _bandwidth_limiter(max_mbps: float) -> TokenBucket | None:
+    """Process-wide byte budget shared by all concurrent uploads (None = unlimited)."""
+    global _BANDWIDTH, _BANDWIDTH_RATE
+    if max_mbps <= 0:
+        return None
+    with _BANDWIDTH_LOCK:
+        if _BANDWIDTH is None or _BANDWIDTH_RATE != max_mbps:
+            rate = max_mbps * 1e6
+            # One second of burst, but always enough for a full read block.
+            _BANDWIDTH = TokenBucket(rate, max(rate, _THROTTLE_BLOCK))
+            _BANDWIDTH_RATE = max_mbps
+        return _BANDWIDTH
+
+
+def _open_media(file_path: str, chunk_size: int, max_mbps: float) -> MediaIoBaseUpload:
+    fd: io.IOBase = open(file_path, "rb")
+    limiter = _bandwidth_limiter(max_mbps)
+    if limiter is not None:
+        fd = _ThrottledReader(fd, limiter)
+    mimetype = mimetypes.guess_type(file_path)[0] or "application/octet-stream"
+    return MediaIoBaseUpload(fd, mimetype=mimetype, chunksize=chunk_size, resumable=True)
+
+
+# Reasons YouTube gives when no more uploads are allowed today.
+_QUOTA_REASONS = {"quotaExceeded", "uploadLimitExceeded", "dailyLimitExceeded"}
+
+# The API quota is reported as 403, the channel's daily upload cap
+# (uploadLimitExceeded) as 400.
+_QUOTA_STATUSES = (400, 403)
+
+
+def is_quota_error(err: Exception) -> bool:
+    if not isinstance(err, HttpError) or err.resp.status not in _QUOTA_STATUSES:
+        return False
+    details = err.error_details if isinstance(err.error_details, list) else []
+    reasons = {d.get("reason") for d in details if isinstance(d, dict)}
+    return bool(reasons & _QUOTA_REASONS) or any(r in str(err.content) for r in _QUOTA_REASONS)
+
+
+# Refresh the access token this long before it expires, so a token never
+# runs out in the middle of a chunk.
+_TOKEN_REFRESH_MARGIN = timedelta(minutes=5)
+
+
+class YouTubeUploader:
+    """Long-lived YouTube API client for one channel's OAuth credentials.
+
+    The API client is built once from the discovery document bundled with
+    google-api-python-client, so no discovery fetch is needed. The access
+    token is cached and refreshed (under a lock) shortly before it expires,
+    instead of once per upload. httplib2 connections aren't thread-safe, so
+    each thread sends its requests through its own authorized ``Http``
+    (from ``build_http``, which keeps 308 from being followed as a
+    redirect), passed explicitly to every request.
+    """
+
+    def __init__(self, *, client_id: str, client_secret: str, refresh_token: str):
+        self._creds = Credentials(
+            token=None,
+            refresh_token=refresh_token,
+            token_uri="https://oauth2.googleapis.com/token",
+            client_id=client_id,
+            client_secret=client_secret,
+            scopes=["https://www.googleapis.com/auth/youtube.upload"],
+        )
+        self._token_lock = threading.Lock()
+        self._auth_request = Request()
+        self._local = threading.local()
+        # The service's own Http is never used: every request gets ``http=``.
+        self.service = build("youtube", "v3", http=build_http(), static_discovery=True, cache_discovery=False)
+
+    def _ensure_token(self) -> None:
+        with self._token_lock:
+            # google-auth keeps ``expiry`` as a naive UTC datetime.
+            now = datetime.now(timezone.utc).replace(tzinfo=None)
+            expiry = self._creds.expiry
+            fresh = expiry is not None and expiry - now > _TOKEN_REFRESH_MARGIN
+            if self._creds.token and fresh:
+                return
+            print("[upload] refreshing access token")
+            self._creds.refresh(self._auth_request)
+
+    def http(self) -> AuthorizedHttp:
+        """This thread's authorized connection, with a token valid for at least a few minutes."""
+        self._ensure_token()
+        authed = getattr(self._local, "http", None)
+        if authed is None:
+            authed = AuthorizedHttp(self._creds, http=build_http())
+            self._local.http = authed
+        return authed
+
+
+_UPLOADERS: dict[tuple[str, str, str], YouTubeUploader] = {}
+_UPLOADERS_LOCK = threading.Lock()
+
+
+def get_uploader(config: Config) -> YouTubeUploader:
+    """Shared uploader for ``config``'s YouTube credentials (one per channel)."""
+    key = (config.youtube_client_id, config.youtube_client_secret, config.youtube_refresh_token)
+    with _UPLOADERS_LOCK:
+        uploader = _UPLOADERS.get(key)
+        if uploader is None:
+            uploader = YouTubeUploader(
+                client_id=config.youtube_client_id,
+                client_secret=config.youtube_client_secret,
+                refresh_token=config.youtube_refresh_token,
+            )
+            _UPLOADERS[key] = uploader
+        return uploader
+
+
+def _query_upload_offset(http: AuthorizedHttp, resume_uri: str, total_size: int) -> int | dict[str, Any] | None:
+    """Ask YouTube how much of an interrupted upload session it has.
+
+    Returns the byte offset to continue from, the finished video resource if
+    the upload had in fact completed, or None if the session has expired.
+    """
+    resp, content = http.request(
+        resume_uri, "PUT", headers={"Content-Range": f"bytes */{total_size}", "Content-Length": "0"}
+    )
+    if resp.status in (200, 201):
+        return json.loads(content)
+    if resp.status == 308:
+        received = resp.get("range")
+        return int(received.split("-")[1]) + 1 if received else 0
+    if resp.status in (404, 410):
+        return None
+    raise HttpError(resp, content, uri=resume_uri)
 
 
 def upload_to_youtube(
@@ -17,20 +273,24 @@ def upload_to_youtube(
     title: str,
     description: str,
     tags: list[str] | None = None,
+    resume_uri: str | None = None,
+    on_session: Callable[[str, int], None] | None = None,
+    on_progress: Callable[[UploadProgress], None] | None = None,
+    on_new_session: Callable[[], None] | None = None,
 ) -> str:
-    creds = Credentials(
-        token=None,
-        refresh_token=config.youtube_refresh_token,
-        token_uri="https://oauth2.googleapis.com/token",
-        client_id=config.youtube_client_id,
-        client_secret=config.youtube_client_secret,
-        scopes=["https://www.googleapis.com/auth/youtube.upload"],
-    )
+    """Upload ``file_path`` and return the new video id.
 
-    print("[upload] refreshing access token")
-    creds.refresh(Request())
+    ``on_session(uri, offset)`` is called after every confirmed chunk so the
+    caller can persist the resumable session; passing that ``uri`` back as
+    ``resume_uri`` continues the upload from the last confirmed byte instead
+    of starting over. Failed chunks are retried with exponential backoff.
 
-    youtube = build("youtube", "v3", credentials=creds)
+    Every confirmed chunk is also logged as an ``[upload:progress]`` line and
+    passed to ``on_progress``. ``on_new_session()`` is called before a new
+    session replaces an expired ``resume_uri``; it may raise to stop the
+    upload (e.g. when the quota can't pay for it).
+    """
+    uploader = get_uploader(config)
 
     body: dict[str, Any] = {
         "snippet": {
@@ -42,20 +302,71 @@ def upload_to_youtube(
         "status": {"privacyStatus": config.youtube_privacy_status},
     }
 
-    print(f"[upload] uploading file: {file_path}")
+    media = _open_media(file_path, _chunk_size_bytes(config.youtube_upload_chunk_mb), config.upload_max_mbps)
+    try:
+        request = uploader.service.videos().insert(part="snippet,status", body=body, media_body=media)
 
-    request = youtube.videos().insert(
-        part="snippet,status",
-        body=body,
-        media_body=MediaFileUpload(file_path, resumable=True),
-    )
+        response: Any = None
+        if resume_uri:
+            state = _query_upload_offset(uploader.http(), resume_uri, media.size())
+            if isinstance(state, dict):
+                response = state
+            elif state is None:
+                print("[upload] previous upload session expired; starting over")
+                if on_new_session is not None:
+                    on_new_session()
+            else:
+                request.resumable_uri = resume_uri
+                request.resumable_progress = state
+                print(f"[upload] resuming at byte {state} of {media.size()}")
+
+        print(f"[upload] uploading file: {file_path} (chunk {media.chunksize() / (1024 * 1024):g}MB)")
+
+        meter = _ThroughputMeter(file_path, media.size(), request.resumable_progress)
+        policy = RetryPolicy(max_attempts=config.youtube_upload_max_retries + 1, max_delay_sec=64.0)
+        failures = 0
+        while response is None:
+            try:
+                _, response = request.next_chunk(http=uploader.http())
+            except HttpError as err:
+                if err.resp.status not in _RETRY_STATUSES:
+                    raise
+                error: Exception = err
+            except _RETRY_EXCEPTIONS as err:
+                error = err
+            else:
+                failures = 0
+                progress = meter.chunk_done(media.size() if response is not None else request.resumable_progress)
+                print(progress.log_line())
+                if on_progress is not None:
+                    on_progress(progress)
+                if on_session is not None and request.resumable_uri and response is None:
+                    on_session(request.resumable_uri, request.resumable_progress)
+                continue
+
+            failures += 1
+            if failures >= policy.max_attempts:
+                raise error
+            delay = policy.delay(failures)
+            print(f"[upload:retry] chunk failed ({error}); retry {failures} in {delay:.1f}s")
+            time.sleep(delay)
+            meter.restart_chunk()
+
+        video_id = response.get("id") if isinstance(response, dict) else None
+        if not video_id:
+            raise RuntimeError("YouTube upload did not return a video id")
+
+        return str(video_id)
+    finally:
+        media.stream().close()
 
-    response = None
-    while response is None:
-        _, response = request.next_chunk()
 
-    video_id = response.get("id") if isinstance(response, dict) else None
-    if not video_id:
-        raise RuntimeError("YouTube upload did not return a video id")
+def set_thumbnail(config: Config, *, video_id: str, image_path: str) -> None:
+    """Set a custom thumbnail (JPEG, under 2 MB) on an uploaded video.
 
-    return str(video_id)
+    YouTube only accepts custom thumbnails from verified channels.
+    """
+    uploader = get_uploader(config)
+    media = MediaFileUpload(image_path, mimetype="image/jpeg")
+    request = uploader.service.thumbnails().set(videoId=video_id, media_body=media)
+    request.execute(http=uploader.http(), num_retries=3)